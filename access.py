@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Upper edges (km) of the buckets used for the distance distribution chart
+DISTANCE_BUCKETS = [0, 10, 25, 50, 100, 200, 500, np.inf]
+DISTANCE_LABELS = ['<10 km', '10-25 km', '25-50 km', '50-100 km', '100-200 km', '200-500 km', '500+ km']
+
+
+def compute_patient_access(locations_df, clinic_indexes):
+    """Distance from every patient location to the nearest Ponseti and non-Ponseti clinic
+
+    Takes the deduplicated location table from aggregate_locations(), so each
+    row stands for patient_count patients. Runs one batched KD-tree query per
+    clinic type, so the result can be thresholded at any radius without
+    recomputing distances.
+    """
+    lons = locations_df['patient_location_long'].to_numpy()
+    lats = locations_df['patient_location_lat'].to_numpy()
+
+    ponseti_km, _ = clinic_indexes['ponseti'].nearest(lons, lats)
+    non_ponseti_km, _ = clinic_indexes['non_ponseti'].nearest(lons, lats)
+
+    return pd.DataFrame({
+        'patient_country': locations_df['patient_country'].to_numpy(),
+        'patient_count': locations_df['patient_count'].to_numpy(),
+        'ponseti_km': ponseti_km.astype(np.float32),
+        'non_ponseti_km': non_ponseti_km.astype(np.float32)
+    }, index=locations_df.index)
+
+
+def _weighted_median(values, weights):
+    """Median of values where each value is repeated weights times"""
+    if len(values) == 0:
+        return np.nan
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    return values[order][np.searchsorted(cumulative, cumulative[-1] / 2)]
+
+
+def _weighted_medians(values, weights, groups):
+    """_weighted_median of values within each group, as a Series indexed by group"""
+    frame = pd.DataFrame({'group': groups, 'value': values, 'weight': weights}).sort_values(['group', 'value'])
+    weight = frame.groupby('group', observed=True)['weight']
+    # The first value reaching half of its group's weight, as in _weighted_median
+    reached = weight.cumsum() >= weight.transform('sum') / 2
+    return frame[reached].groupby('group', observed=True)['value'].first()
+
+
+def summarize_access(access_df, radius_km):
+    """Share of patients within radius_km of a clinic, overall and per country"""
+    counts = access_df['patient_count']
+    within_ponseti = (access_df['ponseti_km'] <= radius_km) * counts
+    within_any = ((access_df['ponseti_km'] <= radius_km) | (access_df['non_ponseti_km'] <= radius_km)) * counts
+
+    by_country = pd.DataFrame({
+        'patient_country': access_df['patient_country'],
+        'patients': counts,
+        'within_ponseti': within_ponseti,
+        'within_any': within_any
+    }).groupby('patient_country', observed=True).sum()
+    by_country['within_ponseti'] = by_country['within_ponseti'] / by_country['patients'] * 100
+    by_country['within_any'] = by_country['within_any'] / by_country['patients'] * 100
+    by_country['median_ponseti_km'] = _weighted_medians(
+        access_df['ponseti_km'].to_numpy(), counts.to_numpy(), access_df['patient_country'].to_numpy()
+    )
+
+    total_patients = int(counts.sum())
+    return {
+        'total_patients': total_patients,
+        'within_ponseti_pct': within_ponseti.sum() / total_patients * 100 if total_patients else 0.0,
+        'within_any_pct': within_any.sum() / total_patients * 100 if total_patients else 0.0,
+        'median_ponseti_km': _weighted_median(access_df['ponseti_km'].to_numpy(), counts.to_numpy()),
+        'by_country': by_country.sort_values('patients', ascending=False)
+    }
+
+
+def distance_distribution(access_df, column='ponseti_km'):
+    """Number of patients per distance bucket"""
+    # Patients with no clinic of this type at all fall into the last bucket
+    distances = access_df[column].clip(upper=np.finfo(np.float32).max)
+    buckets = pd.cut(distances, DISTANCE_BUCKETS, labels=DISTANCE_LABELS, right=False)
+    return access_df['patient_count'].groupby(buckets, observed=False).sum()
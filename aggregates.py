@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from schema import AGE_COLUMNS
+
+TREATED = 'Total new children treated'
+COMPLETED_2_YEARS = 'number of children completed 2 years FAB'
+COMPLETED_4_YEARS = 'NUMBER_OF_CHILDREN_COMPLETED_4_YEARS_FAB'
+EXPECTED = 'Expected number of clubfoot cases'
+
+# Additive measures kept per (country, year); every dashboard figure is a
+# sum or a ratio of sums of these, so they roll up to any set of countries
+CUBE_COLUMNS = ['success_sum', 'success_n', 'coverage_sum', 'coverage_n',
+                TREATED, COMPLETED_2_YEARS, COMPLETED_4_YEARS] + AGE_COLUMNS
+
+
+def _values(treatment_df, col):
+    """Column as a float array with NaN for missing values"""
+    return treatment_df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def build_treatment_cube(treatment_df):
+    """Additive treatment measures per (country, year), plus an 'All Countries' rollup
+
+    Completion and coverage rates are stored as the sum of the per-record
+    rates and the number of records, so the per-year averages shown on the
+    dashboard can be recovered exactly for any country or for all of them.
+    """
+    treated = _values(treatment_df, TREATED)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        success = _values(treatment_df, COMPLETED_2_YEARS) / treated
+        coverage = treated / _values(treatment_df, EXPECTED) * 100
+    # Records without a usable rate count as 0% completion and are skipped for coverage
+    success = np.where(np.isfinite(success), success, 0)
+    has_coverage = np.isfinite(coverage)
+
+    records = pd.DataFrame({
+        'country': treatment_df['Country Name'].astype(str).to_numpy(),
+        'year': _values(treatment_df, 'YEAR_RECORDED'),
+        'success_sum': success,
+        'success_n': 1,
+        'coverage_sum': np.where(has_coverage, coverage, 0),
+        'coverage_n': has_coverage.astype(np.int64),
+        **{col: _values(treatment_df, col) for col in [TREATED, COMPLETED_2_YEARS, COMPLETED_4_YEARS] + AGE_COLUMNS}
+    })
+
+    cube = records.groupby(['country', 'year'], dropna=False).sum()
+    rollup = cube.groupby(level='year', dropna=False).sum()
+    rollup.index = pd.MultiIndex.from_product([['All Countries'], rollup.index], names=['country', 'year'])
+    return pd.concat([cube, rollup])[CUBE_COLUMNS]
+
+
+def _analysis(country_cube):
+    """Dashboard figures for one country's slice of the cube (indexed by year)"""
+    by_year = country_cube[country_cube.index.notna()].copy()
+    by_year.index = by_year.index.astype(np.int64).rename('YEAR_RECORDED')
+
+    success_rate = by_year['success_sum'] / by_year['success_n'] * 100
+    age_data = country_cube[AGE_COLUMNS].sum().astype(np.int64)
+    effectiveness_data = pd.DataFrame({
+        'Stage': ['Started Treatment', 'Completed 2 Years', 'Completed 4 Years'],
+        'Count': [
+            int(country_cube[TREATED].sum()),
+            int(country_cube[COMPLETED_2_YEARS].sum()),
+            int(country_cube[COMPLETED_4_YEARS].sum())
+        ]
+    })
+    coverage_by_year = by_year['coverage_sum'] / by_year['coverage_n'].replace(0, np.nan)
+    return success_rate, age_data, effectiveness_data, coverage_by_year
+
+
+def update_treatment_cube(cube, new_treatment_df):
+    """Add newly ingested treatment records to an existing cube
+
+    Summed with a groupby rather than DataFrame.add, which does not align
+    rows whose year is missing.
+    """
+    combined = pd.concat([cube, build_treatment_cube(new_treatment_df)])
+    return combined.groupby(level=['country', 'year'], dropna=False).sum()[CUBE_COLUMNS]
+
+
+def analyses_from_cube(cube, countries=None):
+    """Dashboard figures per country (and 'All Countries') from a cube
+
+    Pass countries to only recompute those, e.g. after an incremental update.
+    """
+    if countries is not None:
+        cube = cube[cube.index.get_level_values('country').isin(list(countries))]
+    return {
+        country: _analysis(country_cube.droplevel('country'))
+        for country, country_cube in cube.groupby(level='country', sort=False)
+    }
+
+
+def build_treatment_analyses(treatment_df):
+    """Precomputed dashboard figures for every country and for 'All Countries'
+
+    Returns a dict of country -> (success_rate, age_data, effectiveness_data,
+    coverage_by_year), so showing a country is a dictionary lookup.
+    """
+    return analyses_from_cube(build_treatment_cube(treatment_df))
+
+
+def lookup_treatment_analysis(analyses, selected_country):
+    """Figures for a country, or empty figures if it has no treatment records"""
+    if selected_country in analyses:
+        return analyses[selected_country]
+    empty = pd.DataFrame(0, index=pd.Index([], name='year'), columns=CUBE_COLUMNS)
+    return _analysis(empty)
@@ -0,0 +1,183 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from access import compute_patient_access, summarize_access
+from aggregates import lookup_treatment_analysis
+from clinic_dashboard import RADIUS_DEFAULT, build_map_html, calculate_metrics, get_map_zoom
+from coverage_geometry import build_coverage_geometry
+from data_store import DataStore
+from density import build_density_pyramid
+from partitions import CountryPartitions
+from spatial_index import build_clinic_indexes
+
+logger = logging.getLogger(__name__)
+
+# Data loaded once per worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(source_paths, cache_dir, cache_format):
+    """Load the tables in a worker; the parent has already brought the columnar cache up to date"""
+    store = DataStore(source_paths, cache_dir, cache_format)
+    store.refresh()
+    clinics_df, patients_df, locations_df, _ = store.frames()
+    _worker['store'] = store
+    _worker['partitions'] = CountryPartitions({
+        'clinics': clinics_df,
+        'patients': patients_df,
+        'locations': locations_df
+    })
+    _worker['indexes'] = build_clinic_indexes(clinics_df)
+
+
+def map_file_name(country, radius_km):
+    """File name of a country's exported map"""
+    slug = re.sub(r'[^a-z0-9]+', '-', country.lower()).strip('-')
+    return f'{slug}-{radius_km}km.html'
+
+
+def compute_country(country, radii, maps_dir=None):
+    """Every dashboard figure for one country (or 'All Countries') at each radius
+
+    Runs in a worker process set up by _init_worker. Returns a dict of plain
+    records; with maps_dir the coverage maps are written there as HTML.
+    """
+    store, partitions = _worker['store'], _worker['partitions']
+    metrics = calculate_metrics(
+        partitions.frame('clinics'), partitions.frame('patients'), country, partitions=partitions
+    )
+    access_df = compute_patient_access(partitions.get('locations', country), _worker['indexes'])
+    density = None
+    if maps_dir and country != 'All Countries':
+        density = build_density_pyramid(partitions.get('locations', country), zooms=[get_map_zoom(country)])
+
+    metric_rows = []
+    for radius_km in radii:
+        coverage = build_coverage_geometry(partitions.get('clinics', country), radius_km, get_map_zoom(country))
+        access = summarize_access(access_df, radius_km)
+        row = {
+            'country': country,
+            'radius_km': radius_km,
+            **metrics,
+            'ponseti_coverage_km2': coverage['area_km2']['ponseti'],
+            'other_coverage_km2': coverage['area_km2']['other'],
+            'any_coverage_km2': coverage['area_km2']['any'],
+            'within_ponseti_pct': access['within_ponseti_pct'],
+            'within_any_pct': access['within_any_pct'],
+            'median_ponseti_km': access['median_ponseti_km'],
+            'map_file': None
+        }
+        if maps_dir:
+            html = build_map_html(partitions, country, radius_km, coverage=coverage, density=density)
+            if html is not None:
+                row['map_file'] = map_file_name(country, radius_km)
+                with open(os.path.join(maps_dir, row['map_file']), 'w', encoding='utf-8') as f:
+                    f.write(html)
+        metric_rows.append(row)
+
+    success_rate, age_data, effectiveness_data, coverage_by_year = lookup_treatment_analysis(
+        store.treatment_analyses, country
+    )
+    by_year = pd.DataFrame({'success_rate': success_rate, 'coverage_rate': coverage_by_year})
+    return {
+        'metrics': metric_rows,
+        'treatment_by_year': by_year.rename_axis('year').reset_index().assign(country=country),
+        'treatment_age': pd.DataFrame({'country': country, 'age_group': age_data.index, 'patients': age_data.to_numpy()}),
+        'treatment_effectiveness': effectiveness_data.rename(columns={'Stage': 'stage', 'Count': 'count'}).assign(country=country)
+    }
+
+
+def _compute_country_or_error(country, radii, maps_dir=None):
+    """compute_country's result and None, or None and the error, so one country cannot stop the batch"""
+    try:
+        return compute_country(country, radii, maps_dir), None
+    except Exception as e:
+        logger.exception("Could not compute the figures for %s", country)
+        return None, f'{type(e).__name__}: {e}'
+
+
+def run_batch(output_dir, radii=(RADIUS_DEFAULT,), countries=None, with_maps=False, workers=None,
+              source_paths=None, cache_dir=None, cache_format=None):
+    """Compute the dashboard figures for every country in parallel and write them to output_dir
+
+    Writes metrics.parquet (one row per country and radius), the treatment
+    tables treatment_by_year.parquet, treatment_age.parquet and
+    treatment_effectiveness.parquet, and summary.json with the metrics and
+    run details. With with_maps the coverage maps go to output_dir/maps.
+    A country whose figures fail is logged and left out, and summary.json
+    lists it under failed_countries with the error. Returns the metrics
+    DataFrame and the failures as {country: error}.
+    """
+    started = time.time()
+    store = DataStore(source_paths, cache_dir, cache_format)
+    store.refresh()
+    if countries is None:
+        countries = ['All Countries'] + sorted(store.clinics_df['clinic_country'].dropna().astype(str).unique())
+
+    os.makedirs(output_dir, exist_ok=True)
+    maps_dir = os.path.join(output_dir, 'maps') if with_maps else None
+    if maps_dir:
+        os.makedirs(maps_dir, exist_ok=True)
+
+    init_args = (store.source_paths, store.cache_dir, store.cache_format)
+    radii = list(radii)
+    if workers == 1:
+        _init_worker(*init_args)
+        outcomes = [_compute_country_or_error(country, radii, maps_dir) for country in countries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            outcomes = list(pool.map(
+                _compute_country_or_error, countries, [radii] * len(countries), [maps_dir] * len(countries)
+            ))
+    results = [result for result, _ in outcomes if result is not None]
+    failures = {country: error for country, (_, error) in zip(countries, outcomes) if error is not None}
+
+    metrics_df = pd.DataFrame([row for result in results for row in result['metrics']])
+    metrics_df.to_parquet(os.path.join(output_dir, 'metrics.parquet'), index=False)
+    for table in ('treatment_by_year', 'treatment_age', 'treatment_effectiveness'):
+        frame = pd.concat([result[table] for result in results] or [pd.DataFrame(columns=['country'])], ignore_index=True)
+        columns = ['country'] + [col for col in frame.columns if col != 'country']
+        frame[columns].to_parquet(os.path.join(output_dir, f'{table}.parquet'), index=False)
+
+    summary = {
+        'data_version': store.version(),
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'elapsed_s': round(time.time() - started, 2),
+        'rejected_rows': store.rejected,
+        'radii_km': radii,
+        'countries': countries,
+        'failed_countries': failures,
+        'metrics': json.loads(metrics_df.to_json(orient='records'))
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return metrics_df, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the clinic dashboard figures for every country")
+    parser.add_argument('output_dir', help="directory the results are written to")
+    parser.add_argument('--radius', type=int, nargs='+', default=[RADIUS_DEFAULT], help="coverage radii in km")
+    parser.add_argument('--country', action='append', dest='countries', help="only this country (repeatable)")
+    parser.add_argument('--maps', action='store_true', help="also export the coverage maps as HTML")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    metrics_df, failures = run_batch(args.output_dir, args.radius, args.countries, args.maps, args.workers)
+    n_countries = metrics_df['country'].nunique() if len(metrics_df) else 0
+    print(f"Wrote figures for {n_countries} countries to {args.output_dir}")
+    if failures:
+        for country, error in failures.items():
+            print(f"Failed: {country}: {error}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
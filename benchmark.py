@@ -0,0 +1,226 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from access import compute_patient_access, summarize_access
+from aggregates import build_treatment_analyses, lookup_treatment_analysis
+from clinic_dashboard import RADIUS_DEFAULT, calculate_metrics, create_coverage_map, get_map_zoom, render_map_html
+from coverage_geometry import build_coverage_geometry
+from data_store import DataStore
+from density import build_density_pyramid
+from partitions import CountryPartitions
+from spatial_index import build_clinic_indexes
+from synthetic_data import write_dataset
+
+# Named dataset sizes as (patients, clinics)
+SIZES = {
+    'tiny': (1_000, 100),
+    'small': (100_000, 1_000),
+    'medium': (1_000_000, 5_000),
+    'large': (10_000_000, 50_000)
+}
+
+# Slowdown (new / old best time) reported as a regression by --compare
+REGRESSION_RATIO = 1.25
+
+
+def measure(func, repeat=3, memory=True):
+    """Best-of-repeat wall time of func() and, optionally, its peak traced memory
+
+    The memory is measured in one extra run under tracemalloc, which numpy
+    and pandas report their buffers to; it is kept out of the timed runs
+    because tracing slows allocation down. Buffers allocated by pyarrow are
+    not traced; main() also records the process peak RSS per dataset size.
+    Returns (result, stats).
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    stats = {'seconds': times, 'best_s': min(times)}
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = func()
+            stats['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, stats
+
+
+def run_size(n_patients, n_clinics, n_countries=4, seed=0, repeat=3, memory=True, work_dir=None,
+             radius_km=RADIUS_DEFAULT):
+    """Time every dashboard stage on one synthetic dataset; returns {stage: stats}"""
+    data_dir = tempfile.mkdtemp(prefix='gci-bench-', dir=work_dir)
+    try:
+        source_paths = write_dataset(data_dir, n_patients, n_clinics, n_countries, seed)
+        cache_dir = os.path.join(data_dir, '.cache')
+        stages = {}
+
+        def load_cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            store = DataStore(source_paths, cache_dir)
+            store.refresh()
+            return store
+
+        def load_warm():
+            store = DataStore(source_paths, cache_dir)
+            store.refresh()
+            return store
+
+        _, stages['load_data_csv'] = measure(load_cold, repeat, memory)
+        store, stages['load_data_cached'] = measure(load_warm, repeat, memory)
+        clinics_df, patients_df, locations_df, treatment_df = store.frames()
+        country = clinics_df['clinic_country'].value_counts().index[0]
+
+        partitions, stages['partitions'] = measure(lambda: CountryPartitions({
+            'clinics': clinics_df, 'patients': patients_df, 'locations': locations_df
+        }), repeat, memory)
+        indexes, stages['clinic_indexes'] = measure(lambda: build_clinic_indexes(clinics_df), repeat, memory)
+
+        for selection in ('All Countries', country):
+            suffix = 'all' if selection == 'All Countries' else 'country'
+            _, stages[f'calculate_metrics_{suffix}'] = measure(
+                lambda: calculate_metrics(clinics_df, patients_df, selection, partitions=partitions), repeat, memory
+            )
+            coverage, stages[f'coverage_geometry_{suffix}'] = measure(
+                lambda: build_coverage_geometry(partitions.get('clinics', selection), radius_km, get_map_zoom(selection)),
+                repeat, memory
+            )
+            density = None
+            if selection != 'All Countries':
+                density, stages['density_pyramid_country'] = measure(
+                    lambda: build_density_pyramid(partitions.get('locations', selection), zooms=[get_map_zoom(selection)]), repeat, memory
+                )
+            _, stages[f'create_coverage_map_{suffix}'] = measure(lambda: render_map_html(create_coverage_map(
+                partitions.get('clinics', selection),
+                partitions.get('locations', selection) if density is not None else None,
+                max_distance_km=radius_km,
+                show_density=density is not None,
+                selected_country=selection,
+                coverage=coverage,
+                density=density,
+                partitions=partitions
+            )), repeat, memory)
+
+        access_df, stages['patient_access'] = measure(
+            lambda: compute_patient_access(locations_df, indexes), repeat, memory
+        )
+        _, stages['summarize_access'] = measure(lambda: summarize_access(access_df, radius_km), repeat, memory)
+        analyses, stages['treatment_analyses'] = measure(
+            lambda: build_treatment_analyses(treatment_df), repeat, memory
+        )
+        _, stages['get_treatment_analysis'] = measure(
+            lambda: lookup_treatment_analysis(analyses, country), repeat, memory
+        )
+        return stages
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where unavailable"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    scale = 1 if platform.system() == 'Darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2
+
+
+def environment():
+    """Versions and machine details stored with the results"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results, baseline):
+    """Stages whose best time grew by more than REGRESSION_RATIO against a baseline run
+
+    Returns a DataFrame with the old and new best times and their ratio for
+    every stage present in both runs.
+    """
+    rows = []
+    old_runs = {run['name']: run for run in baseline['runs']}
+    for run in results['runs']:
+        old = old_runs.get(run['name'])
+        if old is None:
+            continue
+        for stage, stats in run['stages'].items():
+            if stage in old['stages']:
+                old_s, new_s = old['stages'][stage]['best_s'], stats['best_s']
+                rows.append({'size': run['name'], 'stage': stage, 'old_s': old_s, 'new_s': new_s,
+                             'ratio': new_s / old_s if old_s else np.inf})
+    comparison = pd.DataFrame(rows, columns=['size', 'stage', 'old_s', 'new_s', 'ratio'])
+    comparison['regression'] = comparison['ratio'] > REGRESSION_RATIO
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the clinic dashboard stages on synthetic data")
+    parser.add_argument('--size', nargs='+', default=['tiny', 'small'],
+                        help=f"named sizes ({', '.join(SIZES)}) or PATIENTSxCLINICS, e.g. 500000x2000")
+    parser.add_argument('--countries', type=int, default=4, help="number of countries in the data")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage; the best is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory measurement")
+    parser.add_argument('--work-dir', help="where the synthetic CSVs are written (default: system temp)")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file the results are written to")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'environment': environment(), 'runs': []}
+    for size in args.size:
+        n_patients, n_clinics = SIZES[size] if size in SIZES else map(int, size.lower().split('x'))
+        print(f"{size}: {n_patients} patients, {n_clinics} clinics")
+        stages = run_size(n_patients, n_clinics, args.countries, args.seed, args.repeat,
+                          not args.no_memory, args.work_dir)
+        for stage, stats in stages.items():
+            peak = f"{stats['peak_mb']:10.1f} MB" if 'peak_mb' in stats else ''
+            print(f"  {stage:32s} {stats['best_s']:10.4f} s {peak}")
+        results['runs'].append({
+            'name': size,
+            'patients': n_patients,
+            'clinics': n_clinics,
+            'countries': args.countries,
+            'seed': args.seed,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages
+        })
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            comparison = compare(results, json.load(f))
+        print(comparison.round(4).to_string(index=False))
+        if comparison['regression'].any():
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
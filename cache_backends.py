@@ -0,0 +1,329 @@
+import functools
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Entries unused for this many seconds are dropped (GCI_SHARED_CACHE_TTL, 0 keeps them forever)
+DEFAULT_TTL = int(os.environ.get('GCI_SHARED_CACHE_TTL', 7 * 24 * 3600))
+
+# How often a DiskBackend looks for expired entries, in seconds
+PRUNE_INTERVAL = 3600
+
+# Directory names of the per-code-version namespaces of a DiskBackend
+NAMESPACE_PREFIX = 'code-'
+
+# First bytes of every value get_or_build stores
+ENTRY_MAGIC = b'GCI-CACHE-1\n'
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Fingerprint of the dashboard's source files
+
+    Cache keys are namespaced with it, so results built by other code (an
+    older deploy, or the other half of a rolling one) are never read.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _write_atomic(path, data):
+    """Write bytes through a per-process temporary file so concurrent writers never mix"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class DiskBackend:
+    """Byte values stored as files in a directory, shared by every process that can see it
+
+    Replicas on one host pointed at the same directory reuse each other's
+    results. Writes are atomic, so readers never see a partial value.
+    Entries are kept in a subdirectory per namespace (see code_version).
+    With a ttl, entries not read or written for ttl seconds count as
+    missing and are deleted, in every namespace, by prune(), which runs at
+    start-up and then at most every PRUNE_INTERVAL seconds.
+    """
+
+    def __init__(self, directory, namespace='', ttl=None):
+        self.root = directory
+        self.directory = os.path.join(directory, NAMESPACE_PREFIX + namespace) if namespace else directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+        self._last_prune = time.monotonic()
+        self.prune()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _expired(self, mtime):
+        return bool(self.ttl) and mtime < time.time() - self.ttl
+
+    def get(self, key):
+        """Stored bytes for key, or None"""
+        path = self._path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Reading an entry keeps it alive
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        try:
+            _write_atomic(self._path(key), value)
+        except OSError:
+            logger.warning("Could not write cache entry to %s", self.directory)
+        if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def contains(self, key):
+        try:
+            return not self._expired(os.path.getmtime(self._path(key)))
+        except OSError:
+            return False
+
+    def prune(self):
+        """Delete expired entries of every namespace; returns how many were deleted"""
+        if not self.ttl:
+            return 0
+        directories = {self.directory} | set(glob.glob(os.path.join(self.root, NAMESPACE_PREFIX + '*')))
+        removed = 0
+        for directory in directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file() and self._expired(entry.stat().st_mtime):
+                            os.remove(entry.path)
+                            removed += 1
+                if directory != self.directory:
+                    # Only succeeds once an old namespace is empty
+                    os.rmdir(directory)
+            except OSError:
+                pass
+        return removed
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Byte values stored in Redis, shared by replicas on any host
+
+    client is a redis-py client (or LocalRedis). Keys start with prefix and
+    the namespace (see code_version). Entries expire ttl seconds after they
+    were written if given. Errors talking to the server count as misses, so
+    an outage only makes the dashboard slower.
+    """
+
+    def __init__(self, client, prefix='gci:', ttl=None, namespace=''):
+        self.client = client
+        self.prefix = f'{prefix}{namespace}:' if namespace else prefix
+        self.ttl = ttl or None
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning("Cache get failed: %s", e)
+            return None
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except Exception as e:
+            logger.warning("Cache set failed: %s", e)
+
+    def contains(self, key):
+        try:
+            return bool(self.client.exists(self.prefix + key))
+        except Exception as e:
+            logger.warning("Cache lookup failed: %s", e)
+            return False
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning("Cache delete failed: %s", e)
+
+
+class LocalRedis:
+    """In-process stand-in for a Redis server, implementing the calls RedisBackend makes
+
+    For trying the Redis backend and testing without a server; values are
+    not shared between processes.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name):
+        value, expires = self._values.get(name, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self._values[name]
+            return None
+        return value
+
+    def get(self, name):
+        with self._lock:
+            return self._live(name)
+
+    def set(self, name, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._values[name] = (bytes(value), time.monotonic() + ex if ex else None)
+        return True
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(self._live(name) is not None for name in names)
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._values.pop(name, None) is not None for name in names)
+
+
+def backend_from_url(url, ttl=DEFAULT_TTL):
+    """Cache backend for a URL, or None for no shared cache
+
+    - a directory path or disk:///path stores files in that directory,
+    - redis://host:port/db (or rediss://) uses a Redis server (needs redis-py),
+    - local-redis:// uses the in-process LocalRedis stand-in.
+
+    Keys are namespaced by code_version(), and entries expire after ttl
+    seconds (0 or None keeps them).
+    """
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return RedisBackend(redis.Redis.from_url(url), ttl=ttl, namespace=code_version())
+    if url.startswith('local-redis://'):
+        return RedisBackend(LocalRedis(), ttl=ttl, namespace=code_version())
+    if url.startswith('disk://'):
+        url = url[len('disk://'):]
+    return DiskBackend(url, namespace=code_version(), ttl=ttl)
+
+
+def _encode(value, blobs):
+    """JSON-compatible form of value, with pandas objects and arrays moved to blobs"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, list):
+        return [_encode(item, blobs) for item in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(item, blobs) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) and not key.startswith('__') for key in value):
+            return {key: _encode(item, blobs) for key, item in value.items()}
+        return {'__dict__': [[_encode(key, blobs), _encode(item, blobs)] for key, item in value.items()]}
+    buffer = io.BytesIO()
+    if isinstance(value, pd.DataFrame):
+        value.to_parquet(buffer)
+        encoded = {'__frame__': len(blobs)}
+    elif isinstance(value, pd.Series):
+        value.to_frame('__value__').to_parquet(buffer)
+        encoded = {'__series__': len(blobs), 'name': _encode(value.name, blobs)}
+    elif isinstance(value, np.ndarray):
+        np.save(buffer, value, allow_pickle=False)
+        encoded = {'__array__': len(blobs)}
+    else:
+        raise TypeError(f"Cannot store a {type(value).__name__} in the shared cache")
+    blobs.append(buffer.getvalue())
+    return encoded
+
+
+def _decode(value, blobs):
+    """Inverse of _encode"""
+    if isinstance(value, list):
+        return [_decode(item, blobs) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__tuple__' in value:
+        return tuple(_decode(item, blobs) for item in value['__tuple__'])
+    if '__dict__' in value:
+        return {_decode(key, blobs): _decode(item, blobs) for key, item in value['__dict__']}
+    if '__frame__' in value:
+        return pd.read_parquet(io.BytesIO(blobs[value['__frame__']]))
+    if '__series__' in value:
+        series = pd.read_parquet(io.BytesIO(blobs[value['__series__']]))['__value__']
+        return series.rename(_decode(value['name'], blobs))
+    if '__array__' in value:
+        return np.load(io.BytesIO(blobs[value['__array__']]), allow_pickle=False)
+    return {key: _decode(item, blobs) for key, item in value.items()}
+
+
+def dumps(value):
+    """Serialize a value for the shared cache
+
+    Only data is stored, never code: plain Python values and containers as
+    JSON, DataFrames and Series as Parquet and arrays in NumPy's format, so
+    reading an entry cannot run anything. Raises TypeError for other types.
+    """
+    blobs = []
+    header = json.dumps({'value': _encode(value, blobs), 'blobs': [len(blob) for blob in blobs]}).encode()
+    return b''.join([ENTRY_MAGIC, len(header).to_bytes(8, 'big'), header, *blobs])
+
+
+def loads(data):
+    """Value serialized by dumps(); raises ValueError for anything else"""
+    if not data.startswith(ENTRY_MAGIC):
+        raise ValueError("Not a shared cache entry")
+    start = len(ENTRY_MAGIC) + 8
+    end = start + int.from_bytes(data[len(ENTRY_MAGIC):start], 'big')
+    header = json.loads(data[start:end])
+    blobs = []
+    for size in header['blobs']:
+        blobs.append(data[end:end + size])
+        end += size
+    return _decode(header['value'], blobs)
+
+
+def get_or_build(backend, key, build):
+    """Value for key from the backend, or build() it and store it there (see dumps)
+
+    Without a backend this just calls build(). Entries that cannot be read
+    (e.g. written by another version) are rebuilt, and values dumps() cannot
+    store are returned without being cached.
+    """
+    if backend is None:
+        return build()
+    data = backend.get(key)
+    if data is not None:
+        try:
+            return loads(data)
+        except Exception:
+            logger.warning("Discarding unreadable cache entry %s", key)
+    value = build()
+    try:
+        backend.set(key, dumps(value))
+    except Exception as e:
+        logger.warning("Not caching %s: %s", key, e)
+    return value
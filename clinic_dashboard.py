@@ -1,23 +1,33 @@
 import streamlit as st
 import pandas as pd
 import folium
-from folium.plugins import HeatMap, MarkerCluster
+from folium.plugins import HeatMap
 import plotly.express as px
-from streamlit_folium import folium_static
 import numpy as np
-from scipy.spatial.distance import cdist
-from math import radians, cos, sin, asin, sqrt
 import os
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# Set page config
-st.set_page_config(
-    page_title="Global Clubfoot Initiative Dashboard",
-    page_icon="👣",
-    layout="wide"
-)
+from geo import nearest_neighbour_distances
+from spatial_index import build_clinic_indexes
+from data_store import DataStore
+from ingest import rejected_report_path
+from schema import ponseti_mask, memory_report
+from map_layers import add_clinic_layer, add_suggested_sites_layer
+from placement import suggest_sites
+from coverage_geometry import build_coverage_geometry
+from density import build_density_pyramid, density_level, heatmap_data, top_cells
+from map_cache import MapCache
+from cache_backends import backend_from_url, get_or_build
+from aggregates import lookup_treatment_analysis
+from partitions import CountryPartitions
+from instrumentation import METRICS, timed, track_cache, start_run, finish_run
+from access import compute_patient_access, summarize_access, distance_distribution
 
-# Add custom CSS
-st.markdown("""
+# Custom CSS, added to the page by main()
+CUSTOM_CSS = """
     <style>
     .main {
         padding: 0rem 1rem;
@@ -65,60 +75,89 @@ st.markdown("""
         font-weight: 600;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
 
-@st.cache_data
+# Coverage radius slider range (km)
+RADIUS_MIN, RADIUS_MAX, RADIUS_STEP, RADIUS_DEFAULT = 10, 200, 10, 50
+
+# Views of the dashboard; only the selected one is built on a rerun
+VIEWS = ["🗺️ Clinic Distribution", "📊 Coverage Analysis", "🚶 Patient Access", "📍 Site Planner"]
+
+@track_cache(st.cache_resource)
+def get_shared_cache():
+    """Cache backend shared with other replicas, from GCI_SHARED_CACHE (None if unset)
+
+    A directory path shares results between processes on one host, a
+    redis:// URL between hosts; see cache_backends.backend_from_url().
+    """
+    return backend_from_url(os.environ.get('GCI_SHARED_CACHE'))
+
+@track_cache(st.cache_resource)
+def get_data_store():
+    """Process-wide store of the loaded tables, shared by all sessions"""
+    return DataStore(backend=get_shared_cache())
+
+@timed('load_data')
 def load_data():
-    """Load and preprocess all required data"""
-    # Load global clinic data
-    clinics_df = pd.read_csv('C:/GCI_Hackathon/Location Data/cleaned_Clinic_Locations_Google.csv')
-    
-    # Load patient location data
-    patients_df = pd.read_csv('C:/GCI_Hackathon/Location Data/Dummy - Patient Location.csv')
-    
-    # Load treatment data
-    treatment_df = pd.read_csv('C:/GCI_Hackathon/Treatment Data/Processed_Treatment_Cases_All_Years.csv')
-    
-    # Convert coordinates to float for clinics
-    for col in ['clinic_lat', 'clinic_lon']:
-        clinics_df[col] = pd.to_numeric(clinics_df[col], errors='coerce')
-    
-    # Convert coordinates to float for patients
-    patients_df['patient_location_lat'] = pd.to_numeric(patients_df['patient_location_lat'], errors='coerce')
-    patients_df['patient_location_long'] = pd.to_numeric(patients_df['patient_location_long'], errors='coerce')
-    
-    # Drop rows with missing coordinates
-    clinics_df = clinics_df.dropna(subset=['clinic_lat', 'clinic_lon'])
-    patients_df = patients_df.dropna(subset=['patient_location_lat', 'patient_location_long', 'patient_country'])
-    
-    # Fill NaN values with appropriate defaults
-    clinics_df['clinic_city'] = clinics_df['clinic_city'].fillna('City not available')
-    clinics_df['formatted_address'] = clinics_df['formatted_address'].fillna('Address not available')
-    clinics_df['ponseti_treatment_available'] = clinics_df['ponseti_treatment_available'].fillna('Unknown')
-    
-    # Group patients by location to get counts for heatmap weights
-    patients_df['location_key'] = patients_df['patient_location_lat'].astype(str) + '_' + patients_df['patient_location_long'].astype(str)
-    location_counts = patients_df.groupby('location_key').size().reset_index(name='patient_count')
-    patients_df = patients_df.merge(location_counts, on='location_key', how='left')
-    
-    return clinics_df, patients_df, treatment_df
-
-def get_available_countries(clinics_df):
-    """Get list of available countries from clinic data"""
-    return sorted(clinics_df['clinic_country'].unique())
-
-def calculate_metrics(clinics_df, patients_df=None, selected_countries=None):
-    """Calculate basic metrics for selected countries"""
-    if selected_countries and 'All Countries' not in selected_countries:
-        # Convert single string to list if necessary
-        if isinstance(selected_countries, str):
-            selected_countries = [selected_countries]
+    """Bring the data store up to date and return its snapshot (shared by all sessions, read-only)"""
+    store = get_data_store()
+    store.refresh()
+    data = store.snapshot()
+    for name, count in data.rejected.items():
+        METRICS.set_gauge('ingest_rejected_rows', count, table=name)
+    return data
+
+@track_cache(st.cache_resource, max_entries=2)
+def get_country_partitions(data_version, _clinics_df, _patients_df, _locations_df):
+    """Per-country row ranges of the loaded tables, built once per data version"""
+    return CountryPartitions({
+        'clinics': _clinics_df,
+        'patients': _patients_df,
+        'locations': _locations_df
+    })
+
+@track_cache(st.cache_resource, max_entries=2)
+def get_clinic_indexes(data_version, _clinics_df):
+    """Build the clinic spatial indexes once and share them across reruns and sessions"""
+    return build_clinic_indexes(_clinics_df)
+
+@track_cache(st.cache_resource, max_entries=2)
+def get_patient_access(data_version, _clinic_indexes, _locations_df):
+    """Cache nearest-clinic distances for every patient location; the radius is applied afterwards
+    
+    Rows line up with the locations table, so a country's rows are its partition slice.
+    """
+    return get_or_build(
+        get_shared_cache(), f'access:{data_version}',
+        lambda: compute_patient_access(_locations_df, _clinic_indexes)
+    )
+
+@track_cache(st.cache_resource, max_entries=2)
+def get_memory_report(data_version, _frames):
+    """Memory held by the loaded tables, measured once per data version"""
+    return memory_report(_frames)
+
+@timed('calculate_metrics')
+def calculate_metrics(clinics_df, patients_df=None, selected_countries=None, partitions=None):
+    """Calculate basic metrics for selected countries
+    
+    With partitions (a CountryPartitions) the selected rows are taken from it
+    instead of filtering the given frames.
+    """
+    # Convert single string to list if necessary
+    if isinstance(selected_countries, str):
+        selected_countries = [selected_countries]
+    if partitions is not None:
+        clinics_df = partitions.select('clinics', selected_countries)
+        if patients_df is not None:
+            patients_df = partitions.select('patients', selected_countries)
+    elif selected_countries and 'All Countries' not in selected_countries:
         clinics_df = clinics_df[clinics_df['clinic_country'].isin(selected_countries)]
         if patients_df is not None:
             patients_df = patients_df[patients_df['patient_country'].isin(selected_countries)]
     
     total_clinics = len(clinics_df)
-    ponseti_clinics = len(clinics_df[clinics_df['ponseti_treatment_available'] == True])
+    ponseti_clinics = int(ponseti_mask(clinics_df).sum())
     total_patients = len(patients_df) if patients_df is not None else 0
     
     # Calculate weighted Ponseti coverage rate
@@ -127,34 +166,25 @@ def calculate_metrics(clinics_df, patients_df=None, selected_countries=None):
         base_rate = (ponseti_clinics / total_clinics) * 100
         
         # Geographic distribution factor
-        # For "All Countries", use a simplified calculation to improve performance
+        # For "All Countries", use a country-level calculation
         if selected_countries == ['All Countries']:
             # Calculate distribution based on country-level presence instead of individual clinics
-            countries_with_ponseti = len(clinics_df[clinics_df['ponseti_treatment_available'] == True]['clinic_country'].unique())
+            countries_with_ponseti = len(clinics_df[ponseti_mask(clinics_df)]['clinic_country'].unique())
             total_countries = len(clinics_df['clinic_country'].unique())
             distribution_factor = countries_with_ponseti / total_countries
         else:
             # For specific countries, use the detailed geographic calculation
             if ponseti_clinics > 1:
-                clinic_coords = clinics_df[clinics_df['ponseti_treatment_available'] == True][['clinic_lat', 'clinic_lon']]
-                
-                # Optimize by sampling points if there are too many clinics
-                if len(clinic_coords) > 50:
-                    clinic_coords = clinic_coords.sample(n=50, random_state=42)
+                clinic_coords = clinics_df[ponseti_mask(clinics_df)]
                 
-                total_area = 0
-                coord_array = clinic_coords.values
-                for i in range(len(coord_array)):
-                    # Only calculate distances to 10 nearest points for each clinic
-                    for j in range(i+1, min(i+11, len(coord_array))):
-                        dist = haversine(
-                            coord_array[i][1],  # lon
-                            coord_array[i][0],  # lat
-                            coord_array[j][1],  # lon
-                            coord_array[j][0]   # lat
-                        )
-                        total_area += dist
-                distribution_factor = min(1, total_area / (100 * min(50, ponseti_clinics)))
+                # Sum of distances from every Ponseti clinic to its 10 nearest Ponseti neighbours
+                nearest = nearest_neighbour_distances(
+                    clinic_coords['clinic_lon'].to_numpy(),
+                    clinic_coords['clinic_lat'].to_numpy(),
+                    k=10
+                )
+                total_area = nearest.sum()
+                distribution_factor = min(1, total_area / (100 * ponseti_clinics))
             else:
                 distribution_factor = 1 if ponseti_clinics == 1 else 0
         
@@ -170,13 +200,44 @@ def calculate_metrics(clinics_df, patients_df=None, selected_countries=None):
         'total_patients': total_patients
     }
 
-def create_coverage_map(clinics_df, patients_df=None, max_distance_km=50, show_density=False, selected_country='All Countries'):
-    """Create an interactive map showing clinic locations with coverage and optional patient density"""
+def get_map_zoom(selected_country):
+    """Initial map zoom level for a country selection"""
+    return 6 if selected_country != 'All Countries' else 4
+
+@track_cache(st.cache_data, max_entries=256)
+def get_coverage_geometry(data_version, selected_country, max_distance_km, _partitions):
+    """Cache merged coverage areas by (country, radius)"""
+    clinics_df = _partitions.get('clinics', selected_country)
+    return get_or_build(
+        get_shared_cache(), f'coverage:{data_version}:{selected_country}:{max_distance_km}',
+        lambda: build_coverage_geometry(clinics_df, max_distance_km, get_map_zoom(selected_country))
+    )
+
+@track_cache(st.cache_data, max_entries=64)
+def get_density_pyramid(data_version, selected_country, _partitions):
+    """Cache binned patient density cells by country, at the map's zoom only"""
+    zoom = get_map_zoom(selected_country)
+    return get_or_build(
+        get_shared_cache(), f'density:{data_version}:{selected_country}:{zoom}',
+        lambda: build_density_pyramid(_partitions.get('locations', selected_country), zooms=[zoom])
+    )
+
+@timed('map: build')
+def create_coverage_map(clinics_df, locations_df=None, max_distance_km=50, show_density=False, selected_country='All Countries', marker_mode='auto', coverage=None, density=None, partitions=None):
+    """Create an interactive map showing clinic locations with coverage and optional patient density
+    
+    marker_mode is 'cluster', 'markers' or 'auto' (cluster large clinic sets in the browser).
+    coverage is a precomputed result of build_coverage_geometry() and density one of
+    build_density_pyramid(); both are built on the fly if omitted. With partitions
+    the country's clinics are taken from it instead of filtering clinics_df.
+    """
     if len(clinics_df) == 0:
         return None
     
     # Filter clinics by country
-    if selected_country != 'All Countries':
+    if partitions is not None:
+        clinics_df = partitions.get('clinics', selected_country)
+    elif selected_country != 'All Countries':
         clinics_df = clinics_df[clinics_df['clinic_country'] == selected_country]
     
     # Calculate map center based on filtered clinics
@@ -185,78 +246,41 @@ def create_coverage_map(clinics_df, patients_df=None, max_distance_km=50, show_d
     
     # Create base map with appropriate zoom level
     m = folium.Map(location=[center_lat, center_lon], 
-                  zoom_start=6 if selected_country != 'All Countries' else 4)
+                  zoom_start=get_map_zoom(selected_country))
     
     # Create feature groups for different layers
-    all_clinics = folium.FeatureGroup(name="All Clinics")
-    ponseti_clinics = folium.FeatureGroup(name="Ponseti Clinics Only")
     coverage_group = folium.FeatureGroup(name="Coverage Areas")
     density_group = folium.FeatureGroup(name="Patient Density")
     
-    # Add clinic markers and coverage areas
-    for idx, row in clinics_df.iterrows():
-        # Create detailed popup text
-        popup_text = f"""
-            <div style='font-family: Arial; font-size: 12px;'>
-                <h4 style='margin: 0; color: #2c3e50;'>{row['clinic_city']}, {row['clinic_country']}</h4>
-                <hr style='margin: 5px 0;'>
-                <b>Location:</b><br>
-                {row['formatted_address']}<br><br>
-                <b>Status:</b> Active<br>
-                <b>Ponseti Treatment:</b> {'Available' if row['ponseti_treatment_available'] else 'Not Available'}<br>
-                <b>Clinicians Available:</b> {row['clinicians_available']}<br>
-            </div>
-        """
-        
-        # Create marker with appropriate color based on Ponseti availability
-        is_ponseti = row['ponseti_treatment_available']
-        marker = folium.Marker(
-            location=[row['clinic_lat'], row['clinic_lon']],
-            popup=folium.Popup(popup_text, max_width=300),
-            icon=folium.Icon(
-                color='green' if is_ponseti else 'red',
-                icon='info-sign',
-                prefix='fa'
-            )
-        )
-        
-        # Add to all clinics group
-        marker.add_to(all_clinics)
-        
-        # Add to Ponseti clinics group if applicable
-        if is_ponseti:
-            marker_ponseti = folium.Marker(
-                location=[row['clinic_lat'], row['clinic_lon']],
-                popup=folium.Popup(popup_text, max_width=300),
-                icon=folium.Icon(
-                    color='green',
-                    icon='info-sign',
-                    prefix='fa'
-                )
-            )
-            marker_ponseti.add_to(ponseti_clinics)
-        
-        # Add coverage circle
-        folium.Circle(
-            location=[row['clinic_lat'], row['clinic_lon']],
-            radius=max_distance_km * 1000,  # Convert km to meters
-            color='green' if row['ponseti_treatment_available'] else 'red',
-            fill=True,
-            opacity=0.1,
-            fillOpacity=0.1
-        ).add_to(coverage_group)
+    # Add clinic markers, one layer per Ponseti status so each clinic is emitted once
+    is_ponseti = ponseti_mask(clinics_df)
+    add_clinic_layer(m, clinics_df[is_ponseti], "Ponseti Clinics", marker_mode)
+    add_clinic_layer(m, clinics_df[~is_ponseti], "Other Clinics", marker_mode)
+    
+    # Add merged coverage areas as a single GeoJSON layer
+    if coverage is None:
+        coverage = build_coverage_geometry(clinics_df, max_distance_km, get_map_zoom(selected_country))
+    folium.GeoJson(
+        coverage['geojson'],
+        style_function=lambda feature: {
+            'color': feature['properties']['color'],
+            'weight': 0,
+            'fillOpacity': 0.15
+        }
+    ).add_to(coverage_group)
     
     # Add patient density heatmap if requested and data is available
-    if show_density and patients_df is not None and not patients_df.empty:
+    if show_density and (density is not None or (locations_df is not None and not locations_df.empty)):
         try:
-            # Create heatmap data with weights
-            heat_data = [[row['patient_location_lat'], 
-                         row['patient_location_long'], 
-                         row['patient_count']] for _, row in patients_df.iterrows()]
+            # Use the pre-binned cells for the map's zoom level
+            zoom = get_map_zoom(selected_country)
+            if density is None:
+                density = build_density_pyramid(locations_df, zooms=[zoom])
+            cells = density_level(density, zoom)
             
             # Add heatmap layer with weights
             HeatMap(
-                heat_data,
+                heatmap_data(cells),
                 radius=15,
                 blur=10,
                 max_zoom=1,
@@ -264,14 +288,14 @@ def create_coverage_map(clinics_df, patients_df=None, max_distance_km=50, show_d
                 gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}
             ).add_to(density_group)
             
-            # Add markers with patient counts
-            for _, row in patients_df.drop_duplicates(['patient_location_lat', 'patient_location_long']).iterrows():
+            # Add markers with patient counts for the most populated cells
+            for lat, lon, weight in zip(*(top_cells(cells)[col].tolist() for col in ['lat', 'lon', 'weight'])):
                 folium.CircleMarker(
-                    location=[row['patient_location_lat'], row['patient_location_long']],
+                    location=[lat, lon],
                     radius=5,
                     color='blue',
                     fill=True,
-                    popup=f"Patients at this location: {int(row['patient_count'])}",
+                    popup=f"Patients in this area: {int(weight)}",
                     fill_color='blue',
                     fill_opacity=0.7
                 ).add_to(density_group)
@@ -279,9 +303,7 @@ def create_coverage_map(clinics_df, patients_df=None, max_distance_km=50, show_d
         except Exception as e:
             st.warning(f"Could not create heatmap: {str(e)}")
     
-    # Add all feature groups to map
-    all_clinics.add_to(m)
-    ponseti_clinics.add_to(m)
+    # Add remaining feature groups to map
     coverage_group.add_to(m)
     density_group.add_to(m)
     
@@ -290,91 +312,125 @@ def create_coverage_map(clinics_df, patients_df=None, max_distance_km=50, show_d
     
     return m
 
-def haversine(lon1, lat1, lon2, lat2, unit='km'):
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1 
-    dlat = lat2 - lat1 
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a)) 
-    if unit == 'km':
-        r = 6371
-    elif unit == 'm':
-        r = 6371000
-    return c * r
-
-@st.cache_data
-def get_treatment_analysis(treatment_df, selected_country):
-    """Cache treatment analysis calculations"""
-    if selected_country != 'All Countries':
-        treatment_filtered = treatment_df[treatment_df['Country Name'] == selected_country]
+@timed('map: serialize')
+def render_map_html(m):
+    """Serialize a folium map to standalone HTML, as folium_static does"""
+    return folium.Figure().add_child(m).render()
+
+def build_map_html(partitions, selected_country, max_distance_km, coverage=None, density=None):
+    """Build the coverage map for one (country, radius) selection and serialize it"""
+    show_density = selected_country != 'All Countries'  # Only show density for specific country
+    m = create_coverage_map(
+        partitions.get('clinics', selected_country),
+        partitions.get('locations', selected_country) if show_density else None,
+        max_distance_km=max_distance_km,
+        show_density=show_density,
+        selected_country=selected_country,
+        coverage=coverage,
+        density=density,
+        partitions=partitions
+    )
+    return render_map_html(m) if m else None
+
+def map_cache_key(data_version, selected_country, max_distance_km):
+    """Key of a rendered map in the map cache"""
+    return (data_version, selected_country, max_distance_km, selected_country != 'All Countries')
+
+@track_cache(st.cache_resource)
+def get_map_cache():
+    """Process-wide cache of rendered map HTML, backed by GCI_MAP_CACHE_DIR or else the shared cache"""
+    return MapCache(
+        max_entries=int(os.environ.get('GCI_MAP_CACHE_SIZE', 256)),
+        disk_dir=os.environ.get('GCI_MAP_CACHE_DIR'),
+        backend=get_shared_cache()
+    )
+
+@track_cache(st.cache_resource, max_entries=2)
+def start_map_warmup(data_version, _partitions):
+    """Pre-render maps in the background once per data version
+    
+    GCI_MAP_WARMUP=default renders every country at the default radius,
+    GCI_MAP_WARMUP=all every country at every radius; unset or off does nothing.
+    """
+    mode = os.environ.get('GCI_MAP_WARMUP', 'off')
+    if mode not in ('default', 'all'):
+        return None
+    radii = range(RADIUS_MIN, RADIUS_MAX + 1, RADIUS_STEP) if mode == 'all' else [RADIUS_DEFAULT]
+    countries = ['All Countries'] + _partitions.countries('clinics')
+    keys = [map_cache_key(data_version, country, radius) for country in countries for radius in radii]
+    return get_map_cache().warm(
+        keys,
+        lambda key: build_map_html(_partitions, key[1], key[2])
+    )
+
+def get_treatment_analysis(treatment_analyses, selected_country):
+    """Look up the precomputed treatment analysis for a country"""
+    return lookup_treatment_analysis(treatment_analyses, selected_country)
+
+@track_cache(st.cache_resource)
+def get_section_pool():
+    """Thread pool the page sections are built on, shared by all sessions
+    
+    Sections never wait on each other from a worker (see submit_section),
+    so a bounded pool serves any number of sessions. GCI_SECTION_WORKERS
+    sets its size (default: CPUs + 4, at most 32); 0 builds the sections
+    one after the other in the script thread.
+    """
+    workers = int(os.environ.get('GCI_SECTION_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gci-section') if workers > 0 else None
+
+def _copy_outcome(source, target):
+    """Settle target with the result or exception of the finished source Future"""
+    if source.exception() is not None:
+        target.set_exception(source.exception())
     else:
-        treatment_filtered = treatment_df
-    
-    # Calculate success rate based on completion rate
-    treatment_filtered['success_rate'] = (
-        treatment_filtered['number of children completed 2 years FAB'] / 
-        treatment_filtered['Total new children treated']
-    ).fillna(0) * 100
-    
-    # Calculate all the metrics at once
-    success_rate = treatment_filtered.groupby('YEAR_RECORDED')['success_rate'].mean()
-    age_data = treatment_filtered[['0-1 years', '1-2 years', '2-3 years', '3-4 years', 
-                                 '4-5 years', '5-10 years', '10-15 years', '15+ years']].sum()
-    
-    effectiveness_data = pd.DataFrame({
-        'Stage': ['Started Treatment', 'Completed 2 Years', 'Completed 4 Years'],
-        'Count': [
-            treatment_filtered['Total new children treated'].sum(),
-            treatment_filtered['number of children completed 2 years FAB'].sum(),
-            treatment_filtered['NUMBER_OF_CHILDREN_COMPLETED_4_YEARS_FAB'].sum()
-        ]
-    })
-    
-    coverage_rate = (treatment_filtered['Total new children treated'] / 
-                    treatment_filtered['Expected number of clubfoot cases'] * 100)
-    coverage_by_year = coverage_rate.groupby(treatment_filtered['YEAR_RECORDED']).mean()
-    
-    return success_rate, age_data, effectiveness_data, coverage_by_year
+        target.set_result(source.result())
 
-def main():
-    """Main function for the Streamlit dashboard"""
-    # Load data
-    clinics_df, patients_df, treatment_df = load_data()
-    
-    # Display title
-    st.title("Global Clubfoot Initiative Dashboard")
-    
-    # Sidebar filters
-    with st.sidebar:
-        st.header("📊 Dashboard Controls")
-        
-        # Country selection
-        available_countries = get_available_countries(clinics_df)
-        selected_country = st.selectbox(
-            "Select Country",
-            ['All Countries'] + available_countries
-        )
-        
-        # Coverage radius
-        coverage_radius = st.slider(
-            "Coverage Radius (km)",
-            min_value=10,
-            max_value=200,
-            value=50,
-            step=10,
-            help="Radius around clinics to show potential coverage area"
-        )
+def submit_section(pool, stage, func, *args, after=None, **kwargs):
+    """Build a page section on the pool; returns a Future of func's result
+    
+    The task runs with this rerun's Streamlit context, so cached functions
+    work from the pool thread, and its time is recorded as stage. With after,
+    a Future returned by this function, the task is only queued once after
+    is done and gets its result as the last positional argument, so no
+    worker sits waiting on another section. Without a pool func runs right
+    away.
+    """
+    script_ctx = get_script_run_ctx()
+    context = contextvars.copy_context()
+    
+    def run(*upstream):
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+        with timed(stage):
+            return func(*args, *upstream, **kwargs)
+    
+    if pool is None:
+        future = Future()
+        try:
+            upstream = () if after is None else (after.result(),)
+            with timed(stage):
+                future.set_result(func(*args, *upstream, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    if after is None:
+        return pool.submit(context.run, run)
     
-    # Filter data based on selections
-    clinics_filtered = clinics_df.copy()
-    if selected_country != 'All Countries':
-        clinics_filtered = clinics_filtered[clinics_filtered['clinic_country'] == selected_country]
+    future = Future()
     
-    # Calculate metrics
-    metrics = calculate_metrics(clinics_filtered, patients_df, selected_country)
+    def start(done):
+        if done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            task = pool.submit(context.run, run, done.result())
+            task.add_done_callback(lambda task: _copy_outcome(task, future))
     
-    # Display KPIs at the very top
-    kpi_cols = st.columns(4)
+    after.add_done_callback(start)
+    return future
+
+def render_kpis(metrics, coverage, coverage_radius):
+    """KPI cards shown at the very top"""
+    kpi_cols = st.columns(5)
     
     with kpi_cols[0]:
         st.markdown("""
@@ -413,120 +469,445 @@ def main():
             </div>
         """.format(metrics['total_patients']), unsafe_allow_html=True)
     
-    # Create tabs for different analyses
-    tab1, tab2 = st.tabs([
-        "🗺️ Clinic Distribution",
-        "📊 Coverage Analysis"
-    ])
+    with kpi_cols[4]:
+        st.markdown("""
+            <div style='background-color: white; padding: 1rem; border-radius: 0.5rem; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
+                <h4 style='margin: 0; color: #2c3e50;'>Ponseti Coverage Area</h4>
+                <p style='font-size: 24px; font-weight: bold; margin: 0.5rem 0; color: #16a085;'>{:,.0f} km²</p>
+                <p style='margin: 0; font-size: 12px; color: #7f8c8d;'>
+                    Surface (land and water) within {} km of a Ponseti clinic ({:,.0f} km² within reach of any clinic)
+                </p>
+            </div>
+        """.format(coverage['area_km2']['ponseti'], coverage_radius, coverage['area_km2']['any']), unsafe_allow_html=True)
+
+def build_kpis(clinics_df, patients_df, selected_country, partitions, coverage):
+    """Metrics and coverage areas shown in the KPI cards"""
+    metrics = calculate_metrics(clinics_df, patients_df, selected_country, partitions=partitions)
+    return metrics, coverage
+
+def build_map_section(data_version, patients_version, partitions, selected_country, coverage_radius, coverage):
+    """Map HTML for the selection; a repeated selection is served from the map cache"""
+    return get_map_cache().get_or_build(
+        map_cache_key(data_version, selected_country, coverage_radius),
+        lambda: build_map_html(
+            partitions,
+            selected_country,
+            coverage_radius,
+            coverage=coverage,
+            density=get_density_pyramid(patients_version, selected_country, partitions) if selected_country != 'All Countries' else None
+        )
+    )
+
+@timed('map: embed')
+def embed_map(map_html):
+    """Show map HTML in an iframe
+    
+    st.iframe replaces components.html, which is being removed from
+    Streamlit; older releases without it still use components.html.
+    """
+    if hasattr(st, 'iframe'):
+        st.iframe(map_html, width=1200, height=610)
+    else:
+        import streamlit.components.v1 as components
+        components.html(map_html, width=1200, height=610)
+
+def render_map_section(map_html):
+    """Embed the map, or explain why there is none"""
+    if map_html:
+        embed_map(map_html)
+    else:
+        st.warning("No clinics found for the selected filters.")
+
+def build_coverage_figures(clinics_filtered, treatment_analysis):
+    """The five Coverage Analysis charts, in page order"""
+    figures = {}
+    
+    # Distribution of clinics by country
+    clinic_dist = clinics_filtered['clinic_country'].value_counts()
+    clinic_dist = clinic_dist[clinic_dist > 0]
+    figures['clinics'] = px.bar(
+        x=clinic_dist.index,
+        y=clinic_dist.values,
+        title="Number of Clinics by Country",
+        labels={'x': 'Country', 'y': 'Number of Clinics'},
+        color_discrete_sequence=['#2980b9']  # Blue color
+    )
+    
+    # Ponseti treatment availability
+    ponseti_dist = clinics_filtered['ponseti_treatment_available'].value_counts(dropna=False)
+    ponseti_names = ['Unknown' if pd.isna(x) else 'Available' if x else 'Not Available' for x in ponseti_dist.index]
+    figures['ponseti'] = px.pie(
+        values=ponseti_dist.values,
+        names=ponseti_names,
+        color=ponseti_names,
+        title="Ponseti Treatment Availability",
+        color_discrete_map={'Available': '#27ae60', 'Not Available': '#e74c3c', 'Unknown': '#95a5a6'}  # Green, Red and Grey colors
+    )
+    
+    success_rate, age_data, effectiveness_data, coverage_by_year = treatment_analysis
+    
+    # Treatment success rate over time (using completion rate as success metric)
+    figures['success'] = px.line(
+        x=success_rate.index,
+        y=success_rate.values,
+        title="Treatment Completion Rate Over Time (2 Years FAB)",
+        labels={'x': 'Year', 'y': 'Completion Rate (%)', 'value': 'Rate'},
+        color_discrete_sequence=['#8e44ad']  # Purple color
+    )
+    figures['success'].update_traces(mode='lines+markers')
+    
+    # Age distribution of patients
+    figures['age'] = px.bar(
+        x=age_data.index,
+        y=age_data.values,
+        title="Age Distribution of Patients",
+        labels={'x': 'Age Group', 'y': 'Number of Patients'},
+        color_discrete_sequence=['#e67e22']  # Orange color
+    )
+    
+    # Treatment effectiveness
+    figures['effectiveness'] = px.bar(
+        effectiveness_data,
+        x='Stage',
+        y='Count',
+        title="Treatment Progress Stages",
+        labels={'Count': 'Number of Children'},
+        color_discrete_sequence=['#16a085']  # Turquoise color
+    )
+    
+    # Coverage analysis
+    figures['coverage'] = px.bar(
+        x=coverage_by_year.index,
+        y=coverage_by_year.values,
+        title="Treatment Coverage Rate by Year",
+        labels={'x': 'Year', 'y': 'Coverage Rate (%)', 'value': 'Rate'},
+        color_discrete_sequence=['#c0392b']  # Dark Red color
+    )
+    return figures
+
+@track_cache(st.cache_data, max_entries=64)
+def get_coverage_figures(clinics_version, treatment_version, selected_country, _partitions, _treatment_analyses):
+    """Cache the Coverage Analysis charts by country"""
+    return build_coverage_figures(
+        _partitions.get('clinics', selected_country),
+        get_treatment_analysis(_treatment_analyses, selected_country)
+    )
+
+def render_coverage_analysis(figures):
+    """Coverage Analysis tab content"""
+    st.subheader("Clinic Distribution")
+    st.plotly_chart(figures['clinics'])
+    
+    st.subheader("Ponseti Treatment Availability")
+    st.plotly_chart(figures['ponseti'])
+    
+    st.subheader("Treatment Analysis")
+    for name in ('success', 'age', 'effectiveness', 'coverage'):
+        st.plotly_chart(figures[name])
+
+def build_access_section(data_version, clinics_version, clinics_df, locations_df, partitions, selected_country, coverage_radius):
+    """Patient access figures for the selection"""
+    # Distances are precomputed once; the slider only re-thresholds them
+    access_df = get_patient_access(data_version, get_clinic_indexes(clinics_version, clinics_df), locations_df)
+    access_df = access_df.iloc[partitions.positions('locations', selected_country)]
+    access = summarize_access(access_df, coverage_radius)
+    
+    # Distance distribution
+    distance_dist = pd.DataFrame({
+        'Ponseti': distance_distribution(access_df, 'ponseti_km'),
+        'Non-Ponseti': distance_distribution(access_df, 'non_ponseti_km')
+    })
+    fig = px.bar(
+        distance_dist,
+        x=distance_dist.index,
+        y=['Ponseti', 'Non-Ponseti'],
+        barmode='group',
+        title="Patients by Distance to Nearest Clinic",
+        labels={'x': 'Distance', 'value': 'Number of Patients', 'variable': 'Clinic Type'},
+        color_discrete_sequence=['#27ae60', '#e74c3c']  # Green and Red colors
+    )
+    return access, fig
+
+@track_cache(st.cache_data, max_entries=256)
+def get_access_section(data_version, clinics_version, selected_country, coverage_radius, _clinics_df, _locations_df, _partitions):
+    """Cache the patient access figures by (country, radius)"""
+    return build_access_section(
+        data_version, clinics_version, _clinics_df, _locations_df, _partitions, selected_country, coverage_radius
+    )
+
+def render_patient_access(access, fig, coverage_radius):
+    """Patient Access tab content"""
+    access_cols = st.columns(3)
+    access_cols[0].metric(
+        f"Patients within {coverage_radius} km of a Ponseti clinic",
+        f"{access['within_ponseti_pct']:.1f}%"
+    )
+    access_cols[1].metric(
+        f"Patients within {coverage_radius} km of any clinic",
+        f"{access['within_any_pct']:.1f}%"
+    )
+    access_cols[2].metric(
+        "Median distance to nearest Ponseti clinic",
+        f"{access['median_ponseti_km']:.1f} km"
+    )
+    
+    st.subheader("Distance to Nearest Clinic")
+    st.plotly_chart(fig)
+    
+    # Per-country breakdown
+    st.subheader("Access by Country")
+    st.dataframe(
+        access['by_country'].rename(columns={
+            'patients': 'Patients',
+            'within_ponseti': f'% within {coverage_radius} km (Ponseti)',
+            'within_any': f'% within {coverage_radius} km (Any Clinic)',
+            'median_ponseti_km': 'Median km to Ponseti'
+        }).round(1)
+    )
+
+@track_cache(st.cache_data, max_entries=64)
+def get_site_plan(data_version, selected_country, max_distance_km, n_sites, _partitions):
+    """Cache suggested Ponseti sites by (country, radius, number of sites)"""
+    # Clinics across the border count for coverage, but only the country's own are candidates
+    return get_or_build(
+        get_shared_cache(), f'sites:{data_version}:{selected_country}:{max_distance_km}:{n_sites}',
+        lambda: suggest_sites(
+            _partitions.get('locations', selected_country),
+            _partitions.frame('clinics'),
+            max_distance_km,
+            n_sites,
+            candidate_clinics_df=_partitions.get('clinics', selected_country)
+        )
+    )
+
+def build_site_plan_section(data_version, partitions, selected_country, coverage_radius, n_sites, coverage):
+    """Suggested sites for the selection and the coverage map showing them"""
+    plan = get_site_plan(data_version, selected_country, coverage_radius, n_sites, partitions)
+    
+    def build():
+        m = create_coverage_map(
+            partitions.get('clinics', selected_country),
+            max_distance_km=coverage_radius,
+            selected_country=selected_country,
+            coverage=coverage,
+            partitions=partitions
+        )
+        if m is None:
+            return None
+        add_suggested_sites_layer(m, plan['sites'], coverage_radius)
+        return render_map_html(m)
+    
+    key = ('sites', n_sites) + map_cache_key(data_version, selected_country, coverage_radius)
+    return plan, get_map_cache().get_or_build(key, build)
+
+def render_site_plan(plan, map_html, coverage_radius):
+    """Site Planner view content"""
+    sites = plan['sites']
+    plan_cols = st.columns(3)
+    plan_cols[0].metric(
+        f"Patients within {coverage_radius} km of a Ponseti clinic today",
+        f"{plan['covered_pct']:.1f}%"
+    )
+    plan_cols[1].metric(
+        f"With {len(sites)} new Ponseti sites",
+        f"{sites['covered_pct'].iloc[-1] if len(sites) else plan['covered_pct']:.1f}%"
+    )
+    plan_cols[2].metric("Patients newly within reach", f"{int(sites['new_patients'].sum()):,}")
+    
+    if map_html:
+        embed_map(map_html)
+    
+    st.dataframe(
+        sites.rename(columns={
+            'rank': 'Rank',
+            'site_type': 'Site',
+            'name': 'Clinic',
+            'lat': 'Latitude',
+            'lon': 'Longitude',
+            'new_patients': 'New Patients in Reach',
+            'covered_pct': 'Patients in Reach (%)'
+        }).set_index('Rank').round({'Latitude': 4, 'Longitude': 4, 'Patients in Reach (%)': 1})
+    )
+
+def show_performance_panel(run, map_cache):
+    """Sidebar panel with the stage timings of the current rerun and the cache counters"""
+    st.subheader("⏱️ Performance")
+    total = sum(entry['seconds'] for entry in run if entry['depth'] == 0)
+    st.caption(f"Timed stages of this rerun: {total:.3f} s")
+    run = sorted(run, key=lambda entry: entry['start'])
+    st.dataframe(pd.DataFrame(
+        {'ms': [round(entry['seconds'] * 1000, 1) for entry in run]},
+        index=pd.Index(['\u2003' * entry['depth'] + entry['stage'] for entry in run], name='Stage')
+    ))
+    
+    # Hits and misses since the server started, across all sessions
+    cache_stats = METRICS.cache_stats()
+    cache_stats['map HTML'] = {'hit': map_cache.hits, 'miss': map_cache.misses}
+    st.dataframe(pd.DataFrame(cache_stats).T.rename_axis('Cache'))
+    st.download_button(
+        "Download Prometheus metrics",
+        METRICS.prometheus_text(),
+        file_name='gci_metrics.prom',
+        mime='text/plain'
+    )
+
+def main():
+    """Main function for the Streamlit dashboard"""
+    # Set page config
+    st.set_page_config(
+        page_title="Global Clubfoot Initiative Dashboard",
+        page_icon="👣",
+        layout="wide"
+    )
+    
+    # Add custom CSS
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+    
+    # Stage timings of this rerun, shown in the performance panel
+    run = start_run()
+    
+    # Load data
+    data = load_data()
+    clinics_df, patients_df, locations_df, treatment_df = data.frames()
+    # Derived caches are keyed by the versions of the tables they depend on
+    clinics_version = data.version('clinics')
+    patients_version = data.version('patients')
+    data_version = data.version('clinics', 'patients')
+    partitions = get_country_partitions(data_version, clinics_df, patients_df, locations_df)
+    start_map_warmup(data_version, partitions)
+    
+    # Display title
+    st.title("Global Clubfoot Initiative Dashboard")
+    
+    # Sidebar filters
+    with st.sidebar:
+        st.header("📊 Dashboard Controls")
+        
+        # Country selection
+        available_countries = partitions.countries('clinics')
+        selected_country = st.selectbox(
+            "Select Country",
+            ['All Countries'] + available_countries
+        )
+        
+        # Coverage radius
+        coverage_radius = st.slider(
+            "Coverage Radius (km)",
+            min_value=RADIUS_MIN,
+            max_value=RADIUS_MAX,
+            value=RADIUS_DEFAULT,
+            step=RADIUS_STEP,
+            help="Radius around clinics to show potential coverage area"
+        )
+        
+        # Memory held by the loaded tables
+        with st.expander("💾 Data Memory"):
+            st.dataframe(get_memory_report(data.version(), {
+                'Clinics': clinics_df,
+                'Patients': patients_df,
+                'Patient Locations': locations_df,
+                'Treatment': treatment_df
+            }))
+        
+        # Source rows left out because they failed validation
+        if any(data.rejected.values()):
+            st.warning(f"{sum(data.rejected.values()):,} source rows were rejected while loading")
+            for name, count in data.rejected.items():
+                if count:
+                    st.caption(f"{name}: {count:,} rows, listed in {rejected_report_path(name, get_data_store().cache_dir)}")
+        
+        # Per-stage timings of this rerun, filled in once the page is built
+        show_performance = st.checkbox("Show performance", value=False)
+        performance_panel = st.empty()
+    
+    # Build the sections concurrently; each one is rendered as soon as it is ready
+    pool = get_section_pool()
+    coverage_future = submit_section(
+        pool, 'build: coverage', get_coverage_geometry, clinics_version, selected_country, coverage_radius, partitions
+    )
+    kpi_future = submit_section(
+        pool, 'build: kpis', build_kpis, clinics_df, patients_df, selected_country, partitions,
+        after=coverage_future
+    )
+    
+    # Display KPIs at the very top
+    kpi_container = st.container()
+    sections = {
+        kpi_future: ('kpis', kpi_container, lambda result: render_kpis(*result, coverage_radius))
+    }
+    
+    # Unlike st.tabs, the view selector lets the hidden views skip their work
+    view = st.radio("View", VIEWS, horizontal=True, key='view')
     
-    with tab1:
+    if view == VIEWS[0]:
+        map_future = submit_section(
+            pool, 'build: map', build_map_section,
+            data_version, patients_version, partitions, selected_country, coverage_radius,
+            after=coverage_future
+        )
         # Map instructions
         st.markdown("""
         <div class='map-instructions'>
             <h4 style='margin-top: 0;'>🗺️ Interactive Map Guide</h4>
             <ul>
-                <li><b>Clinic Markers:</b> Green = Ponseti Treatment Available, Red = Not Available</li>
-                <li><b>Coverage Areas:</b> Circles show potential service areas</li>
+                <li><b>Clinic Markers:</b> Green = Ponseti Treatment Available, Red = Not Available (numbered bubbles group nearby clinics; zoom in or click to expand)</li>
+                <li><b>Coverage Areas:</b> Shaded areas show everywhere within the coverage radius of a clinic</li>
                 <li><b>Patient Density:</b> Heat map shows concentration of patients (visible when country is selected)</li>
                 <li><b>Layer Control:</b> Toggle different views using controls in top right</li>
             </ul>
         </div>
         """, unsafe_allow_html=True)
         
-        # Create and display map
-        if selected_country != 'All Countries':
-            # Filter patients for the selected country
-            patients_filtered = patients_df[patients_df['patient_country'] == selected_country].copy()
-        else:
-            patients_filtered = None
-
-        m = create_coverage_map(
-            clinics_filtered,
-            patients_filtered,
-            coverage_radius,
-            selected_country != 'All Countries',  # Only show density for specific country
-            selected_country
-        )
-        if m:
-            folium_static(m, width=1200, height=600)
-        else:
-            st.warning("No clinics found for the selected filters.")
+        map_container = st.container()
+        sections[map_future] = ('map', map_container, render_map_section)
     
-    with tab2:
-        st.header("Coverage Analysis")
-        
-        # Existing coverage analysis code
-        st.subheader("Clinic Distribution")
-        
-        # Distribution of clinics by country
-        clinic_dist = clinics_filtered['clinic_country'].value_counts()
-        fig = px.bar(
-            x=clinic_dist.index,
-            y=clinic_dist.values,
-            title="Number of Clinics by Country",
-            labels={'x': 'Country', 'y': 'Number of Clinics'},
-            color_discrete_sequence=['#2980b9']  # Blue color
+    elif view == VIEWS[1]:
+        figures_future = submit_section(
+            pool, 'build: coverage analysis', get_coverage_figures,
+            clinics_version, data.version('treatment'), selected_country, partitions, data.treatment_analyses
         )
-        st.plotly_chart(fig)
-        
-        # Ponseti treatment availability
-        st.subheader("Ponseti Treatment Availability")
-        ponseti_dist = clinics_filtered['ponseti_treatment_available'].value_counts()
-        fig = px.pie(
-            values=ponseti_dist.values,
-            names=['Available' if x == True else 'Not Available' for x in ponseti_dist.index],
-            title="Ponseti Treatment Availability",
-            color_discrete_sequence=['#27ae60', '#e74c3c']  # Green and Red colors
+        st.header("Coverage Analysis")
+        sections[figures_future] = ('coverage analysis', st.container(), render_coverage_analysis)
+    
+    elif view == VIEWS[2]:
+        access_future = submit_section(
+            pool, 'build: patient access', get_access_section,
+            data_version, clinics_version, selected_country, coverage_radius, clinics_df, locations_df, partitions
         )
-        st.plotly_chart(fig)
-        
-        # New Treatment Analysis Section
-        st.subheader("Treatment Analysis")
-        
-        # Get treatment analysis data
-        success_rate, age_data, effectiveness_data, coverage_by_year = get_treatment_analysis(treatment_df, selected_country)
-        
-        # Treatment success rate over time (using completion rate as success metric)
-        fig = px.line(
-            x=success_rate.index,
-            y=success_rate.values,
-            title="Treatment Completion Rate Over Time (2 Years FAB)",
-            labels={'x': 'Year', 'y': 'Completion Rate (%)', 'value': 'Rate'},
-            color_discrete_sequence=['#8e44ad']  # Purple color
+        st.header("Patient Access")
+        sections[access_future] = (
+            'patient access', st.container(), lambda result: render_patient_access(*result, coverage_radius)
         )
-        fig.update_traces(mode='lines+markers')
-        st.plotly_chart(fig)
-        
-        # Age distribution of patients
-        fig = px.bar(
-            x=age_data.index,
-            y=age_data.values,
-            title="Age Distribution of Patients",
-            labels={'x': 'Age Group', 'y': 'Number of Patients'},
-            color_discrete_sequence=['#e67e22']  # Orange color
+    
+    else:
+        st.header("Site Planner")
+        st.markdown(
+            f"Where new Ponseti clinics would bring the most patients within {coverage_radius} km. "
+            "Candidates are existing clinics without Ponseti treatment and new sites near uncovered patients."
         )
-        st.plotly_chart(fig)
-        
-        # Treatment effectiveness
-        fig = px.bar(
-            effectiveness_data,
-            x='Stage',
-            y='Count',
-            title="Treatment Progress Stages",
-            labels={'Count': 'Number of Children'},
-            color_discrete_sequence=['#16a085']  # Turquoise color
+        n_sites = st.number_input("Number of new Ponseti sites", min_value=1, max_value=25, value=5, step=1)
+        plan_future = submit_section(
+            pool, 'build: site plan', build_site_plan_section,
+            data_version, partitions, selected_country, coverage_radius, int(n_sites),
+            after=coverage_future
         )
-        st.plotly_chart(fig)
-        
-        # Coverage analysis
-        fig = px.bar(
-            x=coverage_by_year.index,
-            y=coverage_by_year.values,
-            title="Treatment Coverage Rate by Year",
-            labels={'x': 'Year', 'y': 'Coverage Rate (%)', 'value': 'Rate'},
-            color_discrete_sequence=['#c0392b']  # Dark Red color
+        sections[plan_future] = (
+            'site plan', st.container(), lambda result: render_site_plan(*result, coverage_radius)
         )
-        st.plotly_chart(fig)
+    
+    for future in as_completed(sections):
+        name, container, render = sections[future]
+        with container, timed(f'render: {name}'):
+            render(future.result())
+    
+    # Cache counters are process-wide; the panel and the exports share them
+    map_cache = get_map_cache()
+    METRICS.set_gauge('map_cache_hits', map_cache.hits)
+    METRICS.set_gauge('map_cache_misses', map_cache.misses)
+    if show_performance:
+        with performance_panel.container():
+            show_performance_panel(run, map_cache)
+    finish_run(run, country=selected_country, radius_km=coverage_radius)
 
 if __name__ == "__main__":
     main()
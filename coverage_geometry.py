@@ -0,0 +1,171 @@
+import numpy as np
+
+from geo import EARTH_RADIUS
+from schema import ponseti_mask
+from spatial_index import ClinicIndex
+
+KM_PER_DEGREE = np.pi * EARTH_RADIUS['km'] / 180
+
+# Roughly 4 screen pixels at zoom level 0, in km; halves with every zoom level
+BASE_TOLERANCE_KM = 626.0
+
+# Grid cells are at most this fraction of the radius, so discs keep their
+# shape and area however far the map is zoomed in
+MAX_CELL_FRACTION = 1 / 3
+
+# Clinics processed per batch when collecting candidate grid cells
+CHUNK_SIZE = 2000
+
+STATUS_COLORS = {
+    'ponseti': 'green',
+    'other': 'red'
+}
+
+
+def zoom_tolerance_km(zoom, radius_km):
+    """Grid cell size coverage is drawn and measured on for a map zoom level
+
+    Detail finer than a few screen pixels at that zoom is left out, but a
+    cell is never larger than MAX_CELL_FRACTION of the radius, as the map
+    can be zoomed in and the drawn area is the one reported.
+    """
+    return min(BASE_TOLERANCE_KM / 2 ** zoom, radius_km * MAX_CELL_FRACTION)
+
+
+def covered_cells(lats, lons, radius_km, cell_km):
+    """Keys of grid cells whose centre lies within radius_km of any point
+
+    The grid is a regular lat/lon grid of cell_km degrees-equivalent; a key is
+    row * n_cols + col. Only cells around each point are tested, in chunks so
+    memory stays bounded. Returns (keys, grid step in degrees).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) == 0:
+        return np.empty(0, dtype=np.int64), cell_km / KM_PER_DEGREE
+
+    # Clinics sharing a location add nothing to the union. Sorting by
+    # latitude keeps the few clinics far from the equator, which need the
+    # widest search in longitude, together in the last chunks.
+    lats, lons = np.unique(np.column_stack([lats, lons]), axis=0).T
+    order = np.argsort(np.abs(lats), kind='stable')
+    lats, lons = lats[order], lons[order]
+
+    step = cell_km / KM_PER_DEGREE
+    n_cols = int(np.ceil(360 / step))
+    n_rows = int(np.ceil(180 / step))
+    index = ClinicIndex(lons, lats)
+
+    # Cells needed either side of a point
+    reach_rows = int(np.ceil(radius_km / cell_km)) + 1
+
+    covered = []
+    for start in range(0, len(lats), CHUNK_SIZE):
+        # Longitude cells shrink towards the poles, so the reach depends on the chunk's latitudes
+        max_lat = min(np.abs(lats[start:start + CHUNK_SIZE]).max() + radius_km / KM_PER_DEGREE, 89.0)
+        reach_cols = int(np.ceil(reach_rows / np.cos(np.radians(max_lat))))
+        d_rows, d_cols = np.meshgrid(
+            np.arange(-reach_rows, reach_rows + 1), np.arange(-reach_cols, reach_cols + 1), indexing='ij'
+        )
+        d_rows, d_cols = d_rows.ravel(), d_cols.ravel()
+
+        rows = np.floor((lats[start:start + CHUNK_SIZE] + 90) / step).astype(np.int64)
+        cols = np.floor((lons[start:start + CHUNK_SIZE] + 180) / step).astype(np.int64)
+        cand_rows = rows[:, None] + d_rows[None, :]
+        cand_cols = (cols[:, None] + d_cols[None, :]) % n_cols
+        valid = (cand_rows >= 0) & (cand_rows < n_rows)
+        keys = np.unique(cand_rows[valid] * n_cols + cand_cols[valid])
+
+        cell_rows, cell_cols = np.divmod(keys, n_cols)
+        distances, _ = index.nearest((cell_cols + 0.5) * step - 180, (cell_rows + 0.5) * step - 90)
+        covered.append(keys[distances <= radius_km])
+
+    return np.unique(np.concatenate(covered)), step
+
+
+def cells_area_km2(keys, step):
+    """Total surface area of grid cells"""
+    n_cols = int(np.ceil(360 / step))
+    rows = keys // n_cols
+    cell_lats = (rows + 0.5) * step - 90
+    return float(((step * KM_PER_DEGREE) ** 2 * np.cos(np.radians(cell_lats))).sum())
+
+
+def cells_to_rectangles(keys, step):
+    """Merge grid cells into as few axis-aligned rectangles as possible
+
+    Consecutive cells in a row become one run, then identical runs in
+    consecutive rows are stacked. Returns an array of
+    (min_lon, min_lat, max_lon, max_lat) rows.
+    """
+    if len(keys) == 0:
+        return np.empty((0, 4))
+    n_cols = int(np.ceil(360 / step))
+    rows, cols = np.divmod(np.sort(keys), n_cols)
+
+    # Horizontal runs
+    breaks = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 1)) + 1
+    run_start = np.concatenate([[0], breaks])
+    run_end = np.concatenate([breaks, [len(keys)]]) - 1
+    run_rows = rows[run_start]
+    run_first, run_last = cols[run_start], cols[run_end]
+
+    # Stack runs with the same column span in consecutive rows
+    order = np.lexsort((run_rows, run_last, run_first))
+    run_rows, run_first, run_last = run_rows[order], run_first[order], run_last[order]
+    breaks = np.flatnonzero(
+        (np.diff(run_first) != 0) | (np.diff(run_last) != 0) | (np.diff(run_rows) != 1)
+    ) + 1
+    block_start = np.concatenate([[0], breaks])
+    block_end = np.concatenate([breaks, [len(run_rows)]]) - 1
+
+    return np.column_stack([
+        run_first[block_start] * step - 180,
+        run_rows[block_start] * step - 90,
+        (run_last[block_start] + 1) * step - 180,
+        (run_rows[block_end] + 1) * step - 90
+    ])
+
+
+def _rectangles_feature(rectangles, status):
+    """GeoJSON MultiPolygon feature for a set of rectangles"""
+    polygons = [
+        [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]
+        for x0, y0, x1, y1 in np.round(rectangles, 4).tolist()
+    ]
+    return {
+        'type': 'Feature',
+        'properties': {'status': status, 'color': STATUS_COLORS[status]},
+        'geometry': {'type': 'MultiPolygon', 'coordinates': polygons}
+    }
+
+
+def build_coverage_geometry(clinics_df, radius_km, zoom):
+    """Union of the coverage discs of Ponseti and other clinics
+
+    Returns a GeoJSON FeatureCollection with one MultiPolygon per status and
+    the covered area in km² for each status and for any clinic.
+
+    The shapes are the grid cells the area is measured on (see
+    zoom_tolerance_km), so the map shows the area reported.
+    """
+    cell_km = zoom_tolerance_km(zoom, radius_km)
+    is_ponseti = ponseti_mask(clinics_df)
+    lats = clinics_df['clinic_lat'].to_numpy()
+    lons = clinics_df['clinic_lon'].to_numpy()
+
+    features = []
+    area_km2 = {}
+    all_keys = []
+    for status, mask in (('ponseti', is_ponseti), ('other', ~is_ponseti)):
+        keys, step = covered_cells(lats[mask], lons[mask], radius_km, cell_km)
+        area_km2[status] = cells_area_km2(keys, step)
+        all_keys.append(keys)
+        if len(keys):
+            features.append(_rectangles_feature(cells_to_rectangles(keys, step), status))
+    area_km2['any'] = cells_area_km2(np.unique(np.concatenate(all_keys)), step)
+
+    return {
+        'geojson': {'type': 'FeatureCollection', 'features': features},
+        'area_km2': area_km2
+    }
@@ -0,0 +1,154 @@
+import threading
+
+from aggregates import analyses_from_cube, build_treatment_cube, update_treatment_cube
+from cache_backends import get_or_build
+from ingest import TABLES, get_cache_dir, get_source_paths, rejected_rows, source_version, sync_table
+from locations import DEFAULT_PRECISION, aggregate_locations, merge_locations
+from partitions import COUNTRY_COLUMNS, sort_by_country
+from schema import concat_frames
+
+
+class DataSnapshot:
+    """The tables, derived data and versions as of one refresh, which never change
+
+    Taking the frames and the versions from one snapshot keeps them paired
+    while another thread refreshes the store.
+    """
+
+    def __init__(self, clinics_df=None, patients_df=None, locations_df=None, treatment_df=None,
+                 treatment_cube=None, treatment_analyses=None, versions=None, rejected=None):
+        self.clinics_df = clinics_df
+        self.patients_df = patients_df
+        self.locations_df = locations_df
+        self.treatment_df = treatment_df
+        self.treatment_cube = treatment_cube
+        self.treatment_analyses = treatment_analyses
+        self.versions = versions or {}
+        self.rejected = rejected or {}
+
+    def frames(self):
+        """(clinics_df, patients_df, locations_df, treatment_df)"""
+        return self.clinics_df, self.patients_df, self.locations_df, self.treatment_df
+
+    def version(self, *names):
+        """Fingerprint of the given tables (all by default), for keying derived caches"""
+        return '-'.join(self.versions.get(name, '') for name in names or TABLES)
+
+
+class DataStore:
+    """The loaded tables and the data derived from them, kept in sync with the sources
+
+    refresh() reads only what changed since the last call: rows appended to
+    a source CSV, or new files matching a glob source, are merged into the
+    tables, the patient locations and the treatment cube without reloading
+    the rest. Any other change reloads the affected table. The frames are
+    replaced, never modified, so callers may keep using the ones they hold.
+    Safe to share between threads.
+
+    Changes are found by comparing the cached parts this store holds with
+    the cache, so rows another process (a replica or the batch export)
+    ingested first are picked up all the same.
+
+    With a shared cache backend (see cache_backends), the patient locations
+    and treatment figures of a full load are taken from it when another
+    process already computed them for the same data.
+
+    rejected holds the number of source rows per table that failed
+    validation during ingest (see ingest.rejected_report_path for the rows).
+    snapshot() returns all of it as of the last refresh in one consistent
+    DataSnapshot.
+    """
+
+    def __init__(self, source_paths=None, cache_dir=None, cache_format=None, backend=None):
+        self.source_paths = source_paths or get_source_paths()
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.cache_format = cache_format
+        self.backend = backend
+        self.clinics_df = None
+        self.patients_df = None
+        self.locations_df = None
+        self.treatment_df = None
+        self.treatment_cube = None
+        self.treatment_analyses = None
+        self.versions = {}
+        self.rejected = {}
+        # Cached parts of each table held in memory, as returned by sync_table
+        self._loaded = {}
+        self._snapshot = DataSnapshot()
+        self._synced_version = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the tables up to date; returns {table: status} for tables that changed
+
+        Statuses are those of ingest.sync_table. Checking for changes only
+        reads file metadata, so this is cheap to call on every rerun.
+        """
+        with self._lock:
+            current = source_version(self.source_paths)
+            if current == self._synced_version:
+                return {}
+            changed = {}
+            for name in TABLES:
+                status, df, state = sync_table(
+                    name, self._loaded.get(name), self.source_paths, self.cache_dir, self.cache_format
+                )
+                if status != 'unchanged':
+                    getattr(self, f'_update_{name}')(status, df, state['version'])
+                    changed[name] = status
+                self._loaded[name] = state
+                self.versions = {**self.versions, name: state['version']}
+            self.rejected = rejected_rows(self.cache_dir)
+            self._snapshot = DataSnapshot(
+                self.clinics_df, self.patients_df, self.locations_df, self.treatment_df,
+                self.treatment_cube, self.treatment_analyses, self.versions, self.rejected
+            )
+            self._synced_version = current
+            return changed
+
+    def _update_clinics(self, status, df, version):
+        if status == 'appended':
+            df = concat_frames([self.clinics_df, df])
+        self.clinics_df = sort_by_country(df, COUNTRY_COLUMNS['clinics'])
+
+    def _update_patients(self, status, df, version):
+        # Patients are grouped by location to get counts for heatmap weights
+        if status == 'appended':
+            locations_df = sort_by_country(
+                merge_locations(self.locations_df, aggregate_locations(df)), COUNTRY_COLUMNS['locations']
+            )
+            df = concat_frames([self.patients_df, df])
+        else:
+            locations_df = get_or_build(
+                self.backend, f'locations:{DEFAULT_PRECISION}:{version}',
+                lambda: sort_by_country(aggregate_locations(df), COUNTRY_COLUMNS['locations'])
+            )
+        self.patients_df = sort_by_country(df, COUNTRY_COLUMNS['patients'])
+        self.locations_df = locations_df
+
+    def _update_treatment(self, status, df, version):
+        if status == 'appended':
+            # Only the countries with new records (and the rollup) need new figures
+            cube = update_treatment_cube(self.treatment_cube, df)
+            countries = set(df[COUNTRY_COLUMNS['treatment']].dropna().astype(str)) | {'All Countries'}
+            analyses = {**self.treatment_analyses, **analyses_from_cube(cube, countries)}
+            df = concat_frames([self.treatment_df, df])
+        else:
+            def build():
+                cube = build_treatment_cube(df)
+                return cube, analyses_from_cube(cube)
+            cube, analyses = get_or_build(self.backend, f'treatment:{version}', build)
+        self.treatment_df, self.treatment_cube, self.treatment_analyses = df, cube, analyses
+
+    def snapshot(self):
+        """The tables and their versions as of the last completed refresh"""
+        # Replaced as a whole at the end of refresh(), so no lock is needed
+        return self._snapshot
+
+    def frames(self):
+        """(clinics_df, patients_df, locations_df, treatment_df) as of the last refresh"""
+        return self._snapshot.frames()
+
+    def version(self, *names):
+        """Fingerprint of the given tables (all by default), for keying derived caches"""
+        return self._snapshot.version(*names)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Width of one density cell in screen pixels, whatever the zoom
+PIXELS_PER_CELL = 4
+
+# Largest number of density cells drawn as individual markers
+MAX_DENSITY_MARKERS = 300
+
+
+def cell_size_deg(zoom):
+    """Density cell size in degrees at a zoom level (256 px tiles)"""
+    return PIXELS_PER_CELL * 360 / (256 * 2 ** zoom)
+
+
+def _cells_frame(rows, cols, weights, zoom):
+    """Non-empty cells with their centre coordinates and summed weight"""
+    size = cell_size_deg(zoom)
+    n_cols = int(np.ceil(360 / size)) + 1
+    keys, inverse = np.unique(rows * n_cols + cols, return_inverse=True)
+    cell_rows, cell_cols = np.divmod(keys, n_cols)
+    return pd.DataFrame({
+        'lat': ((cell_rows + 0.5) * size - 90).astype(np.float32),
+        'lon': ((cell_cols + 0.5) * size - 180).astype(np.float32),
+        'weight': np.bincount(inverse.ravel(), weights=weights, minlength=len(keys))
+    }), cell_rows, cell_cols
+
+
+def build_density_pyramid(locations_df, zooms):
+    """Patient counts binned into non-empty grid cells for each zoom level
+
+    Only the zoom levels drawn should be asked for; the heatmap is emitted
+    once, at the map's initial zoom, so it needs a single level. Locations
+    are binned once at the finest zoom; every coarser level merges
+    2x2 cells of the level below, so only occupied cells are ever stored and
+    the cost depends on the number of locations, not on the country's extent.
+    Returns a dict of zoom -> DataFrame with lat, lon and weight columns.
+    """
+    zooms = sorted(zooms, reverse=True)
+    finest = zooms[0]
+    size = cell_size_deg(finest)
+    rows = np.floor((locations_df['patient_location_lat'].to_numpy(dtype=np.float64) + 90) / size).astype(np.int64)
+    cols = np.floor((locations_df['patient_location_long'].to_numpy(dtype=np.float64) + 180) / size).astype(np.int64)
+    weights = locations_df['patient_count'].to_numpy(dtype=np.float64)
+
+    pyramid = {}
+    level_zoom = finest
+    for zoom in zooms:
+        # Halve the cell indices once per zoom level skipped
+        shift = level_zoom - zoom
+        rows, cols = rows >> shift, cols >> shift
+        level_zoom = zoom
+        cells, rows, cols = _cells_frame(rows, cols, weights, zoom)
+        weights = cells['weight'].to_numpy()
+        pyramid[zoom] = cells
+    return pyramid
+
+
+def density_level(pyramid, zoom):
+    """Cells of the pyramid level closest to a zoom"""
+    closest = min(pyramid, key=lambda level: abs(level - zoom))
+    return pyramid[closest]
+
+
+def heatmap_data(cells):
+    """[lat, lon, weight] rows for folium's HeatMap, weights scaled to 0-1"""
+    if cells.empty:
+        return []
+    weights = cells['weight'].to_numpy() / cells['weight'].max()
+    return np.column_stack([cells['lat'].to_numpy(), cells['lon'].to_numpy(), weights]).tolist()
+
+
+def top_cells(cells, limit=MAX_DENSITY_MARKERS):
+    """The most populated cells, for drawing count markers"""
+    return cells.nlargest(limit, 'weight')
@@ -0,0 +1,107 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Mean Earth radius per unit
+EARTH_RADIUS = {
+    'km': 6371.0,
+    'm': 6371000.0
+}
+
+
+def _earth_radius(unit):
+    """Look up the Earth radius for a distance unit"""
+    if unit not in EARTH_RADIUS:
+        raise ValueError(f"Unknown unit '{unit}', expected one of {sorted(EARTH_RADIUS)}")
+    return EARTH_RADIUS[unit]
+
+
+def _as_radians(values, dtype):
+    """Convert degrees (scalar, list or array) to a radians array of the given dtype"""
+    return np.radians(np.asarray(values, dtype=dtype))
+
+
+def _central_angle(lat1, lon1, lat2, lon2):
+    """Great-circle central angle between broadcastable radian arrays"""
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    # Rounding can push a marginally above 1 for antipodal points
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine(lon1, lat1, lon2, lat2, unit='km'):
+    """Great-circle distance between two points given in degrees"""
+    lon1, lat1, lon2, lat2 = np.radians([lon1, lat1, lon2, lat2])
+    return float(_central_angle(lat1, lon1, lat2, lon2) * _earth_radius(unit))
+
+
+def haversine_rowwise(lon1, lat1, lon2, lat2, unit='km', dtype=np.float64):
+    """Element-wise distances between two equally sized sets of points"""
+    lon1, lat1, lon2, lat2 = (_as_radians(v, dtype) for v in (lon1, lat1, lon2, lat2))
+    radius = np.dtype(dtype).type(_earth_radius(unit))
+    return _central_angle(lat1, lon1, lat2, lon2) * radius
+
+
+def haversine_one_to_many(lon, lat, lons, lats, unit='km', dtype=np.float64):
+    """Distances from a single point to every point in an array"""
+    lons = _as_radians(lons, dtype)
+    lats = _as_radians(lats, dtype)
+    lon, lat = _as_radians([lon, lat], dtype)
+    radius = np.dtype(dtype).type(_earth_radius(unit))
+    return _central_angle(lat, lon, lats, lons) * radius
+
+
+def haversine_pairwise(lons1, lats1, lons2=None, lats2=None, unit='km', dtype=np.float64):
+    """Full distance matrix of shape (len(lons1), len(lons2))
+
+    When the second set is omitted the matrix is computed against the first
+    set itself.
+    """
+    lons1 = _as_radians(lons1, dtype)
+    lats1 = _as_radians(lats1, dtype)
+    if lons2 is None:
+        lons2, lats2 = lons1, lats1
+    else:
+        lons2 = _as_radians(lons2, dtype)
+        lats2 = _as_radians(lats2, dtype)
+    radius = np.dtype(dtype).type(_earth_radius(unit))
+    return _central_angle(lats1[:, None], lons1[:, None], lats2[None, :], lons2[None, :]) * radius
+
+
+def nearest_neighbour_distances(lons, lats, k=10, unit='km', dtype=np.float64):
+    """Distances from each point to its k nearest other points, sorted ascending
+
+    Uses a KD-tree over 3D unit vectors, so it takes O(n log n) time and
+    O(n * k) memory. Returns an array of shape (n, min(k, n - 1)).
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    n = len(lons)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=dtype)
+
+    # Each point is its own nearest neighbour (or ties with a duplicate at
+    # distance 0), so ask for one more and drop the first column
+    chord, _ = cKDTree(to_unit_vectors(lons, lats)).query(to_unit_vectors(lons, lats), k=k + 1)
+    return chord_to_distance(chord[:, 1:], unit=unit).astype(dtype)
+
+
+def to_unit_vectors(lons, lats, dtype=np.float64):
+    """Convert degree coordinates to 3D unit vectors on the sphere, shape (n, 3)"""
+    lons = _as_radians(lons, dtype)
+    lats = _as_radians(lats, dtype)
+    cos_lat = np.cos(lats)
+    return np.column_stack([cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)])
+
+
+def distance_to_chord(distance, unit='km'):
+    """Convert a great-circle distance to the straight-line chord between unit vectors"""
+    angle = np.minimum(np.asarray(distance, dtype=np.float64) / _earth_radius(unit), np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def chord_to_distance(chord, unit='km'):
+    """Convert a unit-vector chord length back to a great-circle distance"""
+    chord = np.clip(np.asarray(chord, dtype=np.float64), 0, 2)
+    return 2 * np.arcsin(chord / 2) * _earth_radius(unit)
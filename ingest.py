@@ -0,0 +1,486 @@
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from schema import SCHEMAS, apply_schema, concat_frames
+from validation import validate_chunk
+
+logger = logging.getLogger(__name__)
+
+# Bump when the preparation steps below change so existing caches are rebuilt
+CACHE_VERSION = 4
+
+# Rows parsed at a time when ingesting a CSV, which bounds the memory used
+# for parsing whatever the size of the file
+CHUNK_ROWS = int(os.environ.get('GCI_INGEST_CHUNK_ROWS', 250_000))
+
+# Cached parts a table may have before they are merged into one, so that
+# many small appends do not slow down every later start
+MAX_PARTS = 16
+
+DEFAULT_DATA_DIR = 'C:/GCI_Hackathon'
+
+# Source CSV locations relative to the data directory
+SOURCE_FILES = {
+    'clinics': os.path.join('Location Data', 'cleaned_Clinic_Locations_Google.csv'),
+    'patients': os.path.join('Location Data', 'Dummy - Patient Location.csv'),
+    'treatment': os.path.join('Treatment Data', 'Processed_Treatment_Cases_All_Years.csv')
+}
+
+# Environment variables that override individual source paths. A path may be
+# a glob pattern (e.g. .../Processed_Treatment_Cases_*.csv); every matching
+# file is then treated as one partition of the table.
+SOURCE_ENV_VARS = {
+    'clinics': 'GCI_CLINICS_CSV',
+    'patients': 'GCI_PATIENTS_CSV',
+    'treatment': 'GCI_TREATMENT_CSV'
+}
+
+CACHE_FORMATS = ('parquet', 'feather')
+
+# Lock file next to manifest.json held while a process changes the cache
+LOCK_FILE = 'manifest.lock'
+
+
+def get_source_paths(data_dir=None):
+    """Resolve the CSV path of each table from the environment or the data directory"""
+    data_dir = data_dir or os.environ.get('GCI_DATA_DIR', DEFAULT_DATA_DIR)
+    return {
+        name: os.environ.get(SOURCE_ENV_VARS[name], os.path.join(data_dir, relative))
+        for name, relative in SOURCE_FILES.items()
+    }
+
+
+def get_cache_dir(data_dir=None):
+    """Directory holding the columnar copies of the source CSVs"""
+    data_dir = data_dir or os.environ.get('GCI_DATA_DIR', DEFAULT_DATA_DIR)
+    return os.environ.get('GCI_CACHE_DIR', os.path.join(data_dir, '.cache'))
+
+
+def _file_hash(path, limit=None, block_size=1 << 20):
+    """SHA-256 of a file, or of its first limit bytes, read in blocks"""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(path, with_hash=False):
+    """Size and modification time of a file, plus its content hash if requested"""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        fingerprint['sha256'] = _file_hash(path)
+    return fingerprint
+
+
+def _source_files(pattern):
+    """Files making up a table: every match of a glob pattern, or the single path"""
+    if glob.has_magic(pattern):
+        return sorted(glob.glob(pattern))
+    return [pattern]
+
+
+def _prepare_clinics(clinics_df):
+    """Coerce clinic columns to the schema"""
+    # Fill NaN values with appropriate defaults
+    clinics_df['clinic_city'] = clinics_df['clinic_city'].fillna('City not available')
+    clinics_df['formatted_address'] = clinics_df['formatted_address'].fillna('Address not available')
+    return apply_schema(clinics_df, 'clinics')
+
+
+def _prepare_patients(patients_df):
+    """Coerce patient columns to the schema"""
+    return apply_schema(patients_df, 'patients')
+
+
+def _prepare_treatment(treatment_df):
+    """Coerce treatment columns to the schema"""
+    return apply_schema(treatment_df, 'treatment')
+
+
+TABLES = ('clinics', 'patients', 'treatment')
+
+# Run on the rows of each chunk that passed validation.validate_chunk()
+PREPARE = {
+    'clinics': _prepare_clinics,
+    'patients': _prepare_patients,
+    'treatment': _prepare_treatment
+}
+
+
+def _read_cached(path, cache_format):
+    if cache_format == 'feather':
+        return pd.read_feather(path)
+    return pd.read_parquet(path)
+
+
+def _read_table(name, cache_dir, entry, parts=None):
+    """Read the cached parts of a table (all by default) and make sure they still match the schema"""
+    frames = [_read_cached(os.path.join(cache_dir, part), entry['format']) for part in parts or entry['parts']]
+    return apply_schema(concat_frames(frames), name)
+
+
+def _write_cached(df, path, cache_format):
+    # Write to a temporary file first so a crash never leaves a truncated cache
+    # behind; the name is per process because replicas may share the cache
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if cache_format == 'feather':
+        df.reset_index(drop=True).to_feather(tmp_path)
+    else:
+        df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, 'manifest.json')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_dir):
+    """Hold the cache directory's lock, so one process or thread at a time changes its parts and manifest"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, LOCK_FILE), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds; keep waiting
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _classify_file(path, seen):
+    """How a source file changed since it was last ingested
+
+    Returns 'unchanged', 'touched' (same content, new mtime), 'new',
+    'appended' (the old content is an unchanged prefix ending in a full line)
+    or 'modified'.
+    """
+    if seen is None:
+        return 'new'
+    current = _fingerprint(path)
+    if current['size'] == seen['size']:
+        if current['mtime_ns'] == seen['mtime_ns']:
+            return 'unchanged'
+        return 'touched' if _file_hash(path) == seen['sha256'] else 'modified'
+    if current['size'] > seen['size'] and _file_hash(path, limit=seen['size']) == seen['sha256']:
+        with open(path, 'rb') as f:
+            f.seek(seen['size'] - 1)
+            if f.read(1) == b'\n':
+                return 'appended'
+    return 'modified'
+
+
+def _read_chunks(path, offset=0):
+    """Parse a CSV in chunks of CHUNK_ROWS rows, only the rows after byte offset if given
+
+    The column names always come from the file's header line. Chunk indexes
+    number the rows read from 0 and continue from one chunk to the next.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if offset:
+            columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+            f.seek(offset)
+            reader = pd.read_csv(f, header=None, names=columns, chunksize=CHUNK_ROWS)
+        else:
+            f.seek(0)
+            reader = pd.read_csv(f, chunksize=CHUNK_ROWS)
+        empty = True
+        for chunk in reader:
+            empty = False
+            yield chunk
+        if empty:
+            # A file with only a header still defines the table's columns
+            yield pd.read_csv(io.BytesIO(header), nrows=0)
+
+
+def rejected_report_path(name, cache_dir=None):
+    """CSV listing the source rows of a table rejected by validation and why"""
+    return os.path.join(cache_dir or get_cache_dir(), f'{name}-rejected.csv')
+
+
+def _report_rejected(report_path, name, source_path, rejected, first_row):
+    """Append rejected rows to the report with their source file and row number"""
+    report = rejected.reindex(columns=['reason', *SCHEMAS[name]])
+    report.insert(0, 'row', first_row + rejected.index + 1)
+    report.insert(0, 'source_file', source_path)
+    report.to_csv(report_path, mode='a', header=not os.path.exists(report_path), index=False)
+
+
+def _ingest_file(name, path, offset=0, first_row=0, write_part=None, report_path=None):
+    """Validate and prepare the rows of one source file a chunk at a time
+
+    Reads the rows after byte offset (all rows by default), numbering them
+    from first_row + 1. Each chunk of prepared rows is passed to write_part
+    as soon as it is ready, or kept and returned without write_part, and
+    rejected rows are appended to the report at report_path. With write_part
+    only one chunk is held in memory. Chunks with no valid rows are dropped,
+    except that a whole file without any still gives one empty frame
+    defining the table's columns. Returns (prepared frames, rows read, rows
+    rejected); the frames are empty with write_part.
+    """
+    frames, rows, rejected_rows = [], 0, 0
+    kept, empty = False, None
+
+    def keep(df):
+        nonlocal kept
+        kept = True
+        if write_part is not None:
+            write_part(df)
+        else:
+            frames.append(df)
+
+    for chunk in _read_chunks(path, offset):
+        valid, rejected = validate_chunk(name, chunk)
+        df = PREPARE[name](valid.reset_index(drop=True))
+        if len(df):
+            keep(df)
+        else:
+            empty = df
+        if len(rejected) and report_path is not None:
+            _report_rejected(report_path, name, path, rejected, first_row)
+        rows += len(chunk)
+        rejected_rows += len(rejected)
+    if not kept and not offset:
+        keep(empty)
+    if rejected_rows:
+        logger.warning("Rejected %d of %d %s rows read from %s", rejected_rows, rows, name, path)
+    return frames, rows, rejected_rows
+
+
+def _store_part(name, df, cache_dir, cache_format, entry):
+    """Write a prepared chunk of rows as the next cached part of a table"""
+    # Part names are never reused, so a list of parts identifies the rows it holds
+    part = f'{name}-{uuid.uuid4().hex[:12]}.{cache_format}'
+    _write_cached(df, os.path.join(cache_dir, part), cache_format)
+    entry['parts'].append(part)
+
+
+def _compact_table(name, df, cache_dir, cache_format, entry):
+    """Replace the cached parts of a table with a single part holding df, the whole table"""
+    old_parts = entry['parts']
+    entry['parts'] = []
+    _store_part(name, df, cache_dir, cache_format, entry)
+    for part in old_parts:
+        try:
+            os.remove(os.path.join(cache_dir, part))
+        except OSError:
+            pass
+
+
+def _remove_orphan_parts(name, cache_dir, entry):
+    """Delete cached parts of a table that its manifest entry does not list
+
+    Such parts are left behind by a process that crashed while writing
+    them, or by versions that wrote the cache without the lock.
+    """
+    listed = set(entry['parts']) if entry else set()
+    for cache_format in CACHE_FORMATS:
+        for path in glob.glob(os.path.join(glob.escape(cache_dir), f'{name}-*.{cache_format}')):
+            if os.path.basename(path) not in listed:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _record_file(entry, path, rows, rejected):
+    entry['files'][path] = {**_fingerprint(path, with_hash=True), 'rows': rows, 'rejected': rejected}
+
+
+def _rebuild_table(name, files, cache_dir, cache_format, old_entry=None):
+    """Parse every source file of a table from scratch into fresh cached parts; returns the new entry"""
+    report_path = rejected_report_path(name, cache_dir)
+    old_files = [os.path.join(cache_dir, part) for part in (old_entry or {}).get('parts', [])]
+    for old_file in old_files + [report_path]:
+        try:
+            os.remove(old_file)
+        except OSError:
+            pass
+    entry = {'version': CACHE_VERSION, 'format': cache_format, 'files': {}, 'parts': []}
+    for path in files:
+        _, rows, rejected = _ingest_file(
+            name, path,
+            write_part=lambda df: _store_part(name, df, cache_dir, cache_format, entry),
+            report_path=report_path
+        )
+        _record_file(entry, path, rows, rejected)
+    return entry
+
+
+def _entry_version(name, entry):
+    hashes = sorted((path, seen['sha256']) for path, seen in entry['files'].items())
+    return hashlib.sha1(json.dumps([CACHE_VERSION, name, hashes]).encode()).hexdigest()[:12]
+
+
+def _sync_cached(name, files, loaded, cache_dir, cache_format, manifest):
+    """sync_table's work on the cache, with its lock held"""
+    entry = manifest.get(name)
+    valid = (
+        entry is not None
+        and entry.get('version') == CACHE_VERSION
+        and entry.get('format') == cache_format
+        and all(os.path.exists(os.path.join(cache_dir, part)) for part in entry.get('parts', []))
+        and set(entry['files']) <= set(files)
+    )
+    changes = {path: _classify_file(path, entry['files'].get(path)) for path in files} if valid else {}
+
+    rebuilt = not valid or 'modified' in changes.values()
+    if rebuilt:
+        entry = _rebuild_table(name, files, cache_dir, cache_format, entry)
+        manifest[name] = entry
+    else:
+        for path, change in changes.items():
+            if change in ('new', 'appended'):
+                # Only the rows after the part already ingested are read
+                seen = entry['files'].get(path) or {'size': 0, 'rows': 0, 'rejected': 0}
+                _, rows, rejected = _ingest_file(
+                    name, path, seen['size'], seen['rows'],
+                    write_part=lambda df: _store_part(name, df, cache_dir, cache_format, entry),
+                    report_path=rejected_report_path(name, cache_dir)
+                )
+                _record_file(entry, path, seen['rows'] + rows, seen['rejected'] + rejected)
+            elif change == 'touched':
+                entry['files'][path]['mtime_ns'] = os.stat(path).st_mtime_ns
+    table = None
+    if len(entry['parts']) > MAX_PARTS:
+        table = _read_table(name, cache_dir, entry)
+        _compact_table(name, table, cache_dir, cache_format, entry)
+
+    # Compare with the parts the caller holds rather than with the source
+    # files, as another process may have ingested the changes already
+    state = {'parts': list(entry['parts']), 'version': _entry_version(name, entry)}
+    held = (loaded or {}).get('parts')
+    if rebuilt or table is not None or held is None or state['parts'][:len(held)] != held:
+        return 'loaded', table if table is not None else _read_table(name, cache_dir, entry), state
+    if len(state['parts']) > len(held):
+        return 'appended', _read_table(name, cache_dir, entry, state['parts'][len(held):]), state
+    return 'unchanged', None, state
+
+
+def sync_table(name, loaded=None, source_paths=None, cache_dir=None, cache_format=None):
+    """Bring one table's columnar cache up to date with its source files
+
+    loaded is the state returned with the copy of the table the caller
+    holds, or None. Returns (status, df, state):
+    - ('unchanged', None, state) when that copy is up to date,
+    - ('appended', delta, state) when the cache only gained rows since; delta
+      holds just those rows, already prepared, whichever process ingested them,
+    - ('loaded', df, state) with the full table otherwise.
+
+    state lists the cached parts the caller now holds and their 'version',
+    a fingerprint of their content that is the same in every process that
+    ingested the same files. Appends cost time proportional to the new rows.
+    Once a table has more than MAX_PARTS parts they are merged into one,
+    which the caller gets as a full load.
+
+    CSVs are parsed in chunks of CHUNK_ROWS rows, each written to the cache
+    as soon as it is validated, and the table is then read back from the
+    cached parts, so parsing never holds more than one chunk. Rows failing
+    validation (see validation.py) are left out and listed with the reason
+    in the CSV at rejected_report_path(); rejected_rows() counts them.
+
+    Processes sharing the cache directory take turns through a lock file,
+    so only the first to see a change ingests it, and parts no manifest
+    lists are deleted.
+    """
+    source_paths = source_paths or get_source_paths()
+    cache_dir = cache_dir or get_cache_dir()
+    cache_format = cache_format or os.environ.get('GCI_CACHE_FORMAT', 'parquet')
+    if cache_format not in CACHE_FORMATS:
+        raise ValueError(f"Unknown cache format '{cache_format}', expected one of {CACHE_FORMATS}")
+
+    files = _source_files(source_paths[name])
+    if not files:
+        raise FileNotFoundError(f"No source files match {source_paths[name]}")
+
+    try:
+        with _cache_lock(cache_dir):
+            manifest = _load_manifest(cache_dir)
+            status, result, state = _sync_cached(name, files, loaded, cache_dir, cache_format, manifest)
+            _save_manifest(cache_dir, manifest)
+            _remove_orphan_parts(name, cache_dir, manifest.get(name))
+    except (OSError, ValueError, TypeError, ImportError):
+        # The dashboard still works from the CSVs when the cache cannot be used;
+        # schema errors in the CSVs themselves are raised again here
+        frames = [df for path in files for df in _ingest_file(name, path)[0]]
+        state = {'parts': None, 'version': source_version({name: source_paths[name]})}
+        return 'loaded', apply_schema(concat_frames(frames), name), state
+    return status, result, state
+
+
+def rejected_rows(cache_dir=None):
+    """Source rows dropped by validation per table, as last ingested into the cache
+
+    The rows and the reasons are listed in the CSV at rejected_report_path().
+    """
+    manifest = _load_manifest(cache_dir or get_cache_dir())
+    return {
+        name: sum(seen.get('rejected', 0) for seen in manifest[name]['files'].values())
+        for name in TABLES if name in manifest
+    }
+
+
+def source_version(source_paths=None):
+    """Short fingerprint of the current source files, for keying derived caches
+
+    Changes whenever a source CSV is replaced, modified or added. Only file
+    metadata is read, so it is cheap enough to call on every rerun.
+    """
+    source_paths = source_paths or get_source_paths()
+    fingerprints = {}
+    for name, pattern in sorted(source_paths.items()):
+        fingerprints[name] = {}
+        for path in _source_files(pattern):
+            try:
+                fingerprints[name][path] = _fingerprint(path)
+            except OSError:
+                fingerprints[name][path] = None
+    payload = json.dumps([CACHE_VERSION, fingerprints], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
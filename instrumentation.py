@@ -0,0 +1,233 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('gci.performance')
+
+# Stage timings of the rerun in progress, and the nesting depth of open stages
+_current_run = contextvars.ContextVar('current_run', default=None)
+_depth = contextvars.ContextVar('stage_depth', default=0)
+# Set by a cached function's body, which only runs on a cache miss
+_cache_computed = contextvars.ContextVar('cache_computed', default=None)
+
+
+def _label_text(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels)
+
+
+class Metrics:
+    """Process-wide stage timings, counters and gauges; safe to use from several threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, stage, seconds):
+        """Record one run of a stage"""
+        with self._lock:
+            calls, total, longest = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+    def increment(self, name, value=1, **labels):
+        """Add to a counter, e.g. increment('cache_requests', cache='x', result='hit')"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def stages(self):
+        """{stage: (calls, total seconds, longest run in seconds)} since start-up"""
+        with self._lock:
+            return dict(self._stages)
+
+    def cache_stats(self):
+        """{cache: {'hit': n, 'miss': n}} for the functions wrapped by track_cache"""
+        stats = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                if name == 'cache_requests':
+                    labels = dict(labels)
+                    stats.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] = value
+        return stats
+
+    def prometheus_text(self, prefix='gci'):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = [
+            f'# HELP {prefix}_stage_calls_total Runs of each dashboard stage',
+            f'# TYPE {prefix}_stage_calls_total counter'
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {calls}' for stage, (calls, _, _) in stages]
+        lines += [
+            f'# HELP {prefix}_stage_seconds_total Time spent in each dashboard stage',
+            f'# TYPE {prefix}_stage_seconds_total counter'
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {total:.6f}' for stage, (_, total, _) in stages]
+        lines += [
+            f'# HELP {prefix}_stage_seconds_max Longest run of each dashboard stage',
+            f'# TYPE {prefix}_stage_seconds_max gauge'
+        ]
+        lines += [f'{prefix}_stage_seconds_max{{stage="{stage}"}} {longest:.6f}' for stage, (_, _, longest) in stages]
+
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            declared = set()
+            for (name, labels), value in series:
+                metric = f'{prefix}_{name}_total' if kind == 'counter' else f'{prefix}_{name}'
+                if metric not in declared:
+                    lines.append(f'# TYPE {metric} {kind}')
+                    declared.add(metric)
+                lines.append(f'{metric}{{{_label_text(labels)}}} {value}' if labels else f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+class timed:
+    """Time a stage, as a context manager or a function decorator
+
+        with timed('map: build'):
+            ...
+
+        @timed('calculate_metrics')
+        def calculate_metrics(...):
+
+    Every run is added to METRICS and, during a rerun started with
+    start_run(), to that rerun's timings. Stages may be nested.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._depth = _depth.get()
+        self._token = _depth.set(self._depth + 1)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        _depth.reset(self._token)
+        METRICS.observe(self.stage, seconds)
+        run = _current_run.get()
+        if run is not None:
+            run.append({'stage': self.stage, 'start': self._start, 'seconds': seconds, 'depth': self._depth})
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def track_cache(cache, **cache_options):
+    """Apply a caching decorator such as st.cache_data and count its hits and misses
+
+        @track_cache(st.cache_data)
+        @track_cache(st.cache_resource, max_entries=2)
+
+    The body of the function only runs on a miss, which is also timed as a
+    stage named after the function. The counts are exported as the
+    cache_requests counter with cache and result labels.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            computed = _cache_computed.get()
+            if computed is not None:
+                computed[0] = True
+            with timed(name):
+                return func(*args, **kwargs)
+
+        cached = cache(**cache_options)(compute) if cache_options else cache(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            computed = [False]
+            token = _cache_computed.set(computed)
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                _cache_computed.reset(token)
+                METRICS.increment('cache_requests', cache=name, result='miss' if computed[0] else 'hit')
+
+        wrapper.clear = getattr(cached, 'clear', None)
+        return wrapper
+    return decorator
+
+
+def start_run():
+    """Start collecting the stage timings of one rerun; returns the list they are added to
+
+    Stages are added as they finish, so nested stages come before the stage
+    that contains them; sort by 'start' for the order they began in.
+    """
+    run = []
+    _current_run.set(run)
+    return run
+
+
+def finish_run(run, **fields):
+    """Export the timings of a finished rerun
+
+    With GCI_PERF_LOG set, one JSON line per rerun (with the stages and any
+    extra fields) is logged to the gci.performance logger and appended to
+    that file. With GCI_PERF_PROM_FILE set, the Prometheus text dump of all
+    metrics is written there, e.g. for node_exporter's textfile collector.
+    """
+    _current_run.set(None)
+    log_path = os.environ.get('GCI_PERF_LOG')
+    if log_path:
+        _ensure_log_handler(log_path)
+        logger.info(json.dumps({
+            'event': 'rerun',
+            'time': time.time(),
+            'total_s': round(sum(entry['seconds'] for entry in run if entry['depth'] == 0), 6),
+            **fields,
+            'stages': [
+                {'stage': entry['stage'], 'seconds': round(entry['seconds'], 6), 'depth': entry['depth']}
+                for entry in sorted(run, key=lambda entry: entry['start'])
+            ]
+        }))
+
+    prom_path = os.environ.get('GCI_PERF_PROM_FILE')
+    if prom_path:
+        try:
+            with open(prom_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(METRICS.prometheus_text())
+            os.replace(prom_path + '.tmp', prom_path)
+        except OSError:
+            logger.warning("Could not write metrics to %s", prom_path)
+
+
+_handler_lock = threading.Lock()
+
+
+def _ensure_log_handler(path):
+    """Attach a JSON-lines file handler for path to the performance logger once"""
+    with _handler_lock:
+        if any(getattr(handler, 'gci_path', None) == path for handler in logger.handlers):
+            return
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler.gci_path = path
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
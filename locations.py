@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import concat_frames
+
+# Decimal places kept when grouping patient coordinates (4 is roughly 11 m)
+DEFAULT_PRECISION = int(os.environ.get('GCI_LOCATION_PRECISION', 4))
+MAX_PRECISION = 7
+
+
+def location_keys(lats, lons, precision=DEFAULT_PRECISION):
+    """Quantize coordinates to a grid and pack each cell into a single int64 key
+
+    Coordinates that round to the same grid cell always share a key, unlike
+    string keys where equal floats can print differently.
+    """
+    if not 0 <= precision <= MAX_PRECISION:
+        raise ValueError(f"precision must be between 0 and {MAX_PRECISION}, got {precision}")
+    scale = 10 ** precision
+    lat_q = np.rint((np.asarray(lats, dtype=np.float64) + 90) * scale).astype(np.int64)
+    lon_q = np.rint((np.asarray(lons, dtype=np.float64) + 180) * scale).astype(np.int64)
+    return lat_q * (360 * scale + 1) + lon_q
+
+
+def key_to_coordinates(keys, precision=DEFAULT_PRECISION):
+    """Centre latitude and longitude of the grid cells behind location keys"""
+    scale = 10 ** precision
+    lat_q, lon_q = np.divmod(np.asarray(keys, dtype=np.int64), 360 * scale + 1)
+    return lat_q / scale - 90, lon_q / scale - 180
+
+
+def aggregate_locations(patients_df, precision=DEFAULT_PRECISION):
+    """Deduplicated patient locations with the number of patients at each
+
+    Returns one row per (country, grid cell) with the cell's coordinates and
+    a patient_count column, ready to be used as heatmap weights.
+    """
+    keys = location_keys(
+        patients_df['patient_location_lat'].to_numpy(),
+        patients_df['patient_location_long'].to_numpy(),
+        precision
+    )
+    counts = pd.DataFrame({
+        'patient_country': patients_df['patient_country'].array,
+        'location_key': keys
+    }).groupby(['patient_country', 'location_key'], observed=True, sort=False).size()
+
+    locations_df = counts.reset_index(name='patient_count')
+    lats, lons = key_to_coordinates(locations_df['location_key'].to_numpy(), precision)
+    locations_df['patient_location_lat'] = lats.astype(np.float32)
+    locations_df['patient_location_long'] = lons.astype(np.float32)
+    locations_df['patient_count'] = locations_df['patient_count'].astype(np.int32)
+    return locations_df
+
+
+def merge_locations(locations_df, new_locations_df):
+    """Add the counts of newly aggregated locations to an existing location table
+
+    Cells already present get their patient_count increased in place of a
+    new row; unseen cells are appended. Both tables must use the same
+    precision. The patients behind locations_df are not needed.
+    """
+    old_keys = pd.MultiIndex.from_arrays([
+        locations_df['patient_country'].astype(str), locations_df['location_key']
+    ])
+    new_keys = pd.MultiIndex.from_arrays([
+        new_locations_df['patient_country'].astype(str), new_locations_df['location_key']
+    ])
+    positions = old_keys.get_indexer(new_keys)
+    seen = positions >= 0
+
+    counts = locations_df['patient_count'].to_numpy().copy()
+    np.add.at(counts, positions[seen], new_locations_df['patient_count'].to_numpy()[seen])
+    merged = locations_df.assign(patient_count=counts)
+    return concat_frames([merged, new_locations_df[~seen]])
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+from cache_backends import backend_from_url
+
+# Bump when the map layout changes so HTML cached on disk is not reused
+MAP_CACHE_VERSION = 1
+
+
+class MapCache:
+    """LRU cache of rendered map HTML, optionally backed by a shared store
+
+    Keys are tuples such as (data version, country, radius, density flag).
+    The in-memory store keeps the most recently used max_entries pages; the
+    backend (see cache_backends), when configured, keeps them until they
+    expire, survives restarts and is shared with other processes. disk_dir
+    is a shortcut for backend_from_url(disk_dir) and, when given, is used
+    instead of backend. Safe to use from several threads.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, backend=None):
+        self.max_entries = max_entries
+        self.backend = backend_from_url(disk_dir) if disk_dir else backend
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _backend_key(self, key):
+        return 'map:' + repr((MAP_CACHE_VERSION, key))
+
+    def _remember(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Cached HTML for key, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        data = self.backend.get(self._backend_key(key)) if self.backend else None
+        if data is not None:
+            html = data.decode('utf-8')
+            self._remember(key, html)
+            with self._lock:
+                self.hits += 1
+            return html
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, html):
+        """Store HTML for key in memory and, if configured, in the backend"""
+        self._remember(key, html)
+        if self.backend:
+            self.backend.set(self._backend_key(key), html.encode('utf-8'))
+
+    def get_or_build(self, key, build):
+        """Cached HTML for key, calling build() to render it on a miss
+
+        build may return None (e.g. nothing to draw); that result is not cached.
+        """
+        html = self.get(key)
+        if html is None:
+            html = build()
+            if html is not None:
+                self.put(key, html)
+        return html
+
+    def warm(self, keys, build):
+        """Render missing keys in a background thread; build(key) returns the HTML
+
+        Returns the started daemon thread.
+        """
+        def run():
+            for key in keys:
+                with self._lock:
+                    cached = key in self._entries
+                if not cached and (not self.backend or not self.backend.contains(self._backend_key(key))):
+                    html = build(key)
+                    if html is not None:
+                        self.put(key, html)
+
+        thread = threading.Thread(target=run, name='map-cache-warmup', daemon=True)
+        thread.start()
+        return thread
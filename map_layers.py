@@ -0,0 +1,127 @@
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster
+
+# Above this many clinics markers are clustered in the browser
+CLUSTER_THRESHOLD = 200
+
+MARKER_MODES = ('auto', 'cluster', 'markers')
+
+# Builds the same marker and popup as clinic_popup_html() from a compact data
+# row: [lat, lon, color, city, country, address, ponseti status, clinicians]
+CLINIC_MARKER_CALLBACK = """
+    var callback = function (row) {
+        var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: row[2], prefix: 'fa'});
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+        marker.bindPopup(
+            "<div style='font-family: Arial; font-size: 12px;'>" +
+            "<h4 style='margin: 0; color: #2c3e50;'>" + row[3] + ", " + row[4] + "</h4>" +
+            "<hr style='margin: 5px 0;'>" +
+            "<b>Location:</b><br>" + row[5] + "<br><br>" +
+            "<b>Status:</b> Active<br>" +
+            "<b>Ponseti Treatment:</b> " + row[6] + "<br>" +
+            "<b>Clinicians Available:</b> " + row[7] + "<br>" +
+            "</div>",
+            {maxWidth: 300}
+        );
+        return marker;
+    };
+"""
+
+
+def clinic_popup_html(city, country, address, ponseti_status, clinicians):
+    """Popup shown when a clinic marker is clicked"""
+    return f"""
+        <div style='font-family: Arial; font-size: 12px;'>
+            <h4 style='margin: 0; color: #2c3e50;'>{city}, {country}</h4>
+            <hr style='margin: 5px 0;'>
+            <b>Location:</b><br>
+            {address}<br><br>
+            <b>Status:</b> Active<br>
+            <b>Ponseti Treatment:</b> {ponseti_status}<br>
+            <b>Clinicians Available:</b> {clinicians}<br>
+        </div>
+    """
+
+
+def clinic_records(clinics_df):
+    """Marker data rows for each clinic, built from column arrays
+
+    Returns a list of [lat, lon, color, city, country, address, ponseti status,
+    clinicians] in plain Python types so it serializes straight to JSON.
+    """
+    ponseti = clinics_df['ponseti_treatment_available']
+    is_ponseti = ponseti.fillna(False).to_numpy(dtype=bool)
+    status = np.where(ponseti.isna().to_numpy(), 'Unknown', np.where(is_ponseti, 'Available', 'Not Available'))
+    clinicians = clinics_df['clinicians_available'].astype('string').fillna('Unknown')
+
+    return [list(record) for record in zip(
+        clinics_df['clinic_lat'].astype(float).tolist(),
+        clinics_df['clinic_lon'].astype(float).tolist(),
+        np.where(is_ponseti, 'green', 'red').tolist(),
+        clinics_df['clinic_city'].astype(str).tolist(),
+        clinics_df['clinic_country'].astype(str).tolist(),
+        clinics_df['formatted_address'].astype(str).tolist(),
+        status.tolist(),
+        clinicians.tolist()
+    )]
+
+
+def _resolve_marker_mode(marker_mode, n_clinics):
+    if marker_mode not in MARKER_MODES:
+        raise ValueError(f"Unknown marker mode '{marker_mode}', expected one of {MARKER_MODES}")
+    if marker_mode == 'auto':
+        return 'cluster' if n_clinics > CLUSTER_THRESHOLD else 'markers'
+    return marker_mode
+
+
+def add_clinic_layer(m, clinics_df, name, marker_mode='auto'):
+    """Add one toggleable layer of clinic markers to the map
+
+    In cluster mode the clinic data is emitted once as a JSON array and the
+    markers are created and clustered by the browser, so the page size and
+    build time stay small for thousands of clinics.
+    """
+    records = clinic_records(clinics_df)
+    if _resolve_marker_mode(marker_mode, len(records)) == 'cluster':
+        FastMarkerCluster(records, callback=CLINIC_MARKER_CALLBACK, name=name).add_to(m)
+        return
+
+    group = folium.FeatureGroup(name=name)
+    for lat, lon, color, city, country, address, status, clinicians in records:
+        folium.Marker(
+            location=[lat, lon],
+            popup=folium.Popup(clinic_popup_html(city, country, address, status, clinicians), max_width=300),
+            icon=folium.Icon(color=color, icon='info-sign', prefix='fa')
+        ).add_to(group)
+    group.add_to(m)
+
+
+def add_suggested_sites_layer(m, sites_df, radius_km, name='Suggested Ponseti Sites'):
+    """Add the sites from placement.suggest_sites() with their coverage circles"""
+    group = folium.FeatureGroup(name=name)
+    for rank, site_type, site_name, lat, lon, new_patients in zip(
+        *(sites_df[col].tolist() for col in ['rank', 'site_type', 'name', 'lat', 'lon', 'new_patients'])
+    ):
+        folium.Circle(
+            location=[lat, lon],
+            radius=radius_km * 1000,
+            color='#2980b9',
+            weight=2,
+            dash_array='6',
+            fill=False
+        ).add_to(group)
+        folium.Marker(
+            location=[lat, lon],
+            popup=folium.Popup(f"""
+                <div style='font-family: Arial; font-size: 12px;'>
+                    <h4 style='margin: 0; color: #2c3e50;'>Suggested site #{rank}</h4>
+                    <hr style='margin: 5px 0;'>
+                    <b>{site_type}</b>{'<br>' + site_name if site_name else ''}<br><br>
+                    <b>Patients newly within {radius_km} km:</b> {new_patients}<br>
+                </div>
+            """, max_width=300),
+            tooltip=f"Suggested site #{rank}",
+            icon=folium.Icon(color='blue', icon='star', prefix='fa')
+        ).add_to(group)
+    group.add_to(m)
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Country column of each table
+COUNTRY_COLUMNS = {
+    'clinics': 'clinic_country',
+    'patients': 'patient_country',
+    'locations': 'patient_country',
+    'treatment': 'Country Name'
+}
+
+
+def sort_by_country(df, country_column):
+    """Stable-sort a table so the rows of each country are contiguous"""
+    return df.sort_values(country_column, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def _country_bounds(values):
+    """Row range of each country in a column where equal values are contiguous
+
+    Returns None if some country's rows are not contiguous.
+    """
+    codes, uniques = pd.factorize(values)
+    if len(codes) == 0:
+        return {}
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1])
+    stops = np.concatenate([starts[1:], [len(codes)]])
+    run_codes = codes[starts]
+    if len(run_codes) != len(np.unique(run_codes)):
+        return None
+    return {
+        str(uniques[code]): slice(int(start), int(stop))
+        for code, start, stop in zip(run_codes, starts, stops)
+        if code >= 0
+    }
+
+
+class CountryPartitions:
+    """Per-country row ranges of the loaded tables, built once at load time
+
+    Each table is kept sorted by country, so a country's rows are a single
+    iloc slice: selecting a country costs no scan and no copy. Tables that
+    are not yet sorted are sorted on construction; use frame() to get the
+    table the row ranges refer to.
+    """
+
+    def __init__(self, frames, country_columns=COUNTRY_COLUMNS):
+        self._frames = {}
+        self._bounds = {}
+        for name, df in frames.items():
+            column = country_columns[name]
+            bounds = _country_bounds(df[column].to_numpy())
+            if bounds is None:
+                df = sort_by_country(df, column)
+                bounds = _country_bounds(df[column].to_numpy())
+            self._frames[name] = df
+            self._bounds[name] = bounds
+
+    def frame(self, name):
+        """The full (country-sorted) table"""
+        return self._frames[name]
+
+    def countries(self, name):
+        """Sorted list of countries present in a table"""
+        return sorted(self._bounds[name])
+
+    def positions(self, name, country):
+        """Row slice of a country in the table; 'All Countries' covers every row"""
+        if country == 'All Countries':
+            return slice(0, len(self._frames[name]))
+        return self._bounds[name].get(country, slice(0, 0))
+
+    def get(self, name, country='All Countries'):
+        """Rows of one country, or the whole table for 'All Countries'"""
+        if country == 'All Countries':
+            return self._frames[name]
+        return self._frames[name].iloc[self.positions(name, country)]
+
+    def select(self, name, countries=None):
+        """Rows of a country or list of countries; None or 'All Countries' selects everything"""
+        if countries is None or isinstance(countries, str):
+            return self.get(name, countries or 'All Countries')
+        if not countries or 'All Countries' in countries:
+            return self._frames[name]
+        if len(countries) == 1:
+            return self.get(name, countries[0])
+        return pd.concat([self.get(name, country) for country in countries])
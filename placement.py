@@ -0,0 +1,143 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from coverage_geometry import KM_PER_DEGREE
+from schema import ponseti_mask
+from spatial_index import ClinicIndex
+
+# Demand cells are this fraction of the radius; locations in a cell are
+# merged into one weighted point, which moves no patient by more than the
+# cell diagonal (about 14% of the radius)
+DEMAND_CELL_FRACTION = 0.1
+
+# New-site candidates are centres of grid cells of this fraction of the radius
+CANDIDATE_CELL_FRACTION = 0.5
+
+SITE_TYPES = {
+    'clinic': 'Existing clinic',
+    'grid': 'New site'
+}
+
+
+def _grid_cells(lats, lons, weights, step):
+    """Weighted centroid and total weight of the occupied cells of a lat/lon grid"""
+    rows = np.floor((lats + 90) / step).astype(np.int64)
+    cols = np.floor((lons + 180) / step).astype(np.int64)
+    _, inverse = np.unique(rows * (int(np.ceil(360 / step)) + 1) + cols, return_inverse=True)
+    inverse = inverse.ravel()
+    total = np.bincount(inverse, weights=weights)
+    return (
+        np.bincount(inverse, weights=lats * weights) / total,
+        np.bincount(inverse, weights=lons * weights) / total,
+        total
+    )
+
+
+def uncovered_demand(locations_df, clinics_df, radius_km):
+    """Patient locations farther than radius_km from every Ponseti clinic
+
+    Returns (lats, lons, patient counts) merged into demand cells, and the
+    number of patients already covered.
+    """
+    lats = locations_df['patient_location_lat'].to_numpy(dtype=np.float64)
+    lons = locations_df['patient_location_long'].to_numpy(dtype=np.float64)
+    counts = locations_df['patient_count'].to_numpy(dtype=np.float64)
+
+    ponseti = ClinicIndex.from_clinics(clinics_df[ponseti_mask(clinics_df)])
+    distances, _ = ponseti.nearest(lons, lats)
+    uncovered = distances > radius_km
+    covered = float(counts[~uncovered].sum())
+    if not uncovered.any():
+        return np.empty(0), np.empty(0), np.empty(0), covered
+
+    step = max(radius_km * DEMAND_CELL_FRACTION, 0.5) / KM_PER_DEGREE
+    return (*_grid_cells(lats[uncovered], lons[uncovered], counts[uncovered], step), covered)
+
+
+def candidate_sites(clinics_df, demand_lats, demand_lons, demand_weights, radius_km):
+    """Candidate sites: clinics without Ponseti treatment plus grid cells with uncovered patients
+
+    Returns a DataFrame with site_type, name, lat and lon columns.
+    """
+    others = clinics_df[~ponseti_mask(clinics_df)]
+    names = others['clinic_city'].astype(str).where(others['clinic_city'].notna(), '')
+    clinic_sites = pd.DataFrame({
+        'site_type': SITE_TYPES['clinic'],
+        'name': (names + ', ' + others['formatted_address'].astype(str)).str.strip(', ').to_numpy(),
+        'lat': others['clinic_lat'].to_numpy(dtype=np.float64),
+        'lon': others['clinic_lon'].to_numpy(dtype=np.float64)
+    })
+    if len(demand_lats):
+        step = radius_km * CANDIDATE_CELL_FRACTION / KM_PER_DEGREE
+        grid_lats, grid_lons, _ = _grid_cells(demand_lats, demand_lons, demand_weights, step)
+    else:
+        grid_lats = grid_lons = np.empty(0)
+    grid_sites = pd.DataFrame({'site_type': SITE_TYPES['grid'], 'name': '', 'lat': grid_lats, 'lon': grid_lons})
+    return pd.concat([clinic_sites, grid_sites], ignore_index=True)
+
+
+def greedy_max_coverage(candidate_members, weights, n_sites):
+    """Pick up to n_sites candidates covering the most total weight
+
+    candidate_members is a list of arrays of demand positions each candidate
+    covers. Uses lazy evaluation: a candidate's gain can only shrink as
+    others are picked, so stale gains in the heap are upper bounds and only
+    the top candidate is re-evaluated. Returns (chosen positions, gains).
+    """
+    covered = np.zeros(len(weights), dtype=bool)
+    heap = [(-weights[members].sum(), position) for position, members in enumerate(candidate_members)]
+    heapq.heapify(heap)
+
+    chosen, gains = [], []
+    while heap and len(chosen) < n_sites:
+        _, position = heapq.heappop(heap)
+        members = candidate_members[position]
+        gain = weights[members[~covered[members]]].sum()
+        if gain <= 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, position))
+            continue
+        chosen.append(position)
+        gains.append(gain)
+        covered[members] = True
+    return chosen, gains
+
+
+def suggest_sites(locations_df, clinics_df, radius_km, n_sites=5, candidate_clinics_df=None):
+    """Where the next n_sites Ponseti clinics would bring the most patients within radius_km
+
+    Patients already within radius_km of a Ponseti clinic in clinics_df are
+    covered. Candidates are the clinics without Ponseti treatment in
+    candidate_clinics_df (default clinics_df), e.g. those of one country, and
+    the centres of grid cells holding uncovered patients. Returns a dict with a
+    'sites' DataFrame (rank, site_type, name, lat, lon, new_patients,
+    covered_pct after adding the site), 'total_patients' and 'covered_pct'
+    for the current Ponseti clinics.
+    """
+    total = float(locations_df['patient_count'].sum())
+    demand_lats, demand_lons, demand_weights, covered = uncovered_demand(locations_df, clinics_df, radius_km)
+    if candidate_clinics_df is None:
+        candidate_clinics_df = clinics_df
+    candidates = candidate_sites(candidate_clinics_df, demand_lats, demand_lons, demand_weights, radius_km)
+
+    # Candidate -> demand pairs within the radius, grouped by candidate
+    candidate_positions, demand_positions = ClinicIndex(candidates['lon'], candidates['lat']).pairs_within_radius(
+        ClinicIndex(demand_lons, demand_lats), radius_km
+    )
+    order = np.argsort(candidate_positions, kind='stable')
+    bounds = np.searchsorted(candidate_positions[order], np.arange(len(candidates) + 1))
+    members = np.split(demand_positions[order], bounds[1:-1]) if len(candidates) else []
+
+    chosen, gains = greedy_max_coverage(members, demand_weights, n_sites)
+    sites = candidates.iloc[chosen].reset_index(drop=True)
+    sites.insert(0, 'rank', np.arange(1, len(sites) + 1))
+    sites['new_patients'] = np.round(gains).astype(np.int64)
+    sites['covered_pct'] = (covered + np.cumsum(gains)) / total * 100 if total else 0.0
+    return {
+        'sites': sites,
+        'total_patients': int(total),
+        'covered_pct': covered / total * 100 if total else 0.0
+    }
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+AGE_COLUMNS = ['0-1 years', '1-2 years', '2-3 years', '3-4 years',
+               '4-5 years', '5-10 years', '10-15 years', '15+ years']
+
+# Column dtypes for each table. Columns not listed are compacted generically
+# by compact_frame().
+CLINICS_SCHEMA = {
+    'clinic_country': 'category',
+    'clinic_city': 'category',
+    'formatted_address': 'string[pyarrow]',
+    'clinic_lat': 'float32',
+    'clinic_lon': 'float32',
+    'ponseti_treatment_available': 'boolean',
+    'clinicians_available': 'Int16'
+}
+
+PATIENTS_SCHEMA = {
+    'patient_country': 'category',
+    'patient_location_lat': 'float32',
+    'patient_location_long': 'float32'
+}
+
+TREATMENT_SCHEMA = {
+    'Country Name': 'category',
+    'YEAR_RECORDED': 'Int16',
+    'Total new children treated': 'Int32',
+    'number of children completed 2 years FAB': 'Int32',
+    'NUMBER_OF_CHILDREN_COMPLETED_4_YEARS_FAB': 'Int32',
+    'Expected number of clubfoot cases': 'Int32',
+    **{col: 'Int16' for col in AGE_COLUMNS}
+}
+
+SCHEMAS = {
+    'clinics': CLINICS_SCHEMA,
+    'patients': PATIENTS_SCHEMA,
+    'treatment': TREATMENT_SCHEMA
+}
+
+# Spellings accepted for the Ponseti availability flag
+BOOLEAN_VALUES = {
+    'true': True, 'yes': True, 'y': True, '1': True, '1.0': True,
+    'false': False, 'no': False, 'n': False, '0': False, '0.0': False
+}
+
+# Wider type to fall back to when values overflow a small nullable int
+WIDER_INT = {'Int8': 'Int16', 'Int16': 'Int32', 'Int32': 'Int64'}
+
+
+def _to_boolean(series):
+    """Map True/False/Yes/No style values to a nullable boolean; anything else is NA"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('boolean')
+    mapped = series.astype('string').str.strip().str.lower().map(BOOLEAN_VALUES)
+    return mapped.astype('boolean')
+
+
+def _to_nullable_int(series, dtype):
+    """Coerce to a nullable int, widening the type if values do not fit"""
+    values = pd.to_numeric(series, errors='coerce')
+    # Fractional counts are not expected; round rather than fail the cast
+    values = values.round()
+    while dtype in WIDER_INT:
+        info = np.iinfo(dtype.lower())
+        if values.isna().all() or (values.min() >= info.min and values.max() <= info.max):
+            break
+        dtype = WIDER_INT[dtype]
+    return values.astype(dtype)
+
+
+def coerce_column(series, dtype):
+    """Convert one column to its declared dtype"""
+    if series.dtype == dtype:
+        return series
+    if dtype == 'boolean':
+        return _to_boolean(series)
+    if dtype.startswith('Int'):
+        return _to_nullable_int(series, dtype)
+    if dtype.startswith('float'):
+        return pd.to_numeric(series, errors='coerce').astype(dtype)
+    return series.astype(dtype)
+
+
+def _downcast_int(series):
+    """Smallest signed integer type holding a numpy integer column, without temporary copies"""
+    if not len(series):
+        return series
+    low, high = series.min(), series.max()
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if low >= info.min and high <= info.max:
+            return series if series.dtype == dtype else series.astype(dtype)
+    return series
+
+
+def compact_frame(df, columns=None, max_category_ratio=0.5):
+    """Shrink columns in place: low-cardinality text to category, integers downcast"""
+    for col in (df.columns if columns is None else columns):
+        series = df[col]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique() / len(series) <= max_category_ratio:
+                df[col] = series.astype('category')
+        elif pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            downcast = _downcast_int(series)
+            if downcast is not series:
+                df[col] = downcast
+    return df
+
+
+def apply_schema(df, name):
+    """Enforce the declared schema of a table, raising if a declared column is missing"""
+    schema = SCHEMAS[name]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise ValueError(f"{name} data is missing required columns: {', '.join(missing)}")
+
+    compact_frame(df, [col for col in df.columns if col not in schema])
+    for col, dtype in schema.items():
+        # Reassigning a column copies it, so columns already in shape are left alone
+        series = df[col]
+        coerced = coerce_column(series, dtype)
+        if coerced is not series:
+            df[col] = coerced
+    return df
+
+
+def concat_frames(frames):
+    """Concatenate frames of one table, unifying categories so categorical columns survive
+
+    Empty frames add no rows and are left out. A column with no values has
+    no categories, whose dtype need not match the others', so only the
+    columns with categories are unified.
+    """
+    frames = [df for df in frames if len(df)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    frames = [df.copy(deep=False) for df in frames]
+    for col in frames[0].columns:
+        if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames if col in df):
+            columns = [df[col] for df in frames if col in df and len(df[col].cat.categories)]
+            if not columns:
+                continue
+            categories = pd.api.types.union_categoricals(columns).categories
+            for df in frames:
+                if col in df:
+                    df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def ponseti_mask(clinics_df):
+    """Plain boolean mask of clinics offering Ponseti treatment (unknown counts as no)"""
+    return clinics_df['ponseti_treatment_available'].fillna(False).to_numpy(dtype=bool)
+
+
+def memory_report(frames):
+    """Rows and deep memory usage (MB) of each named DataFrame"""
+    report = pd.DataFrame([
+        {
+            'Table': name,
+            'Rows': len(df),
+            'Memory (MB)': df.memory_usage(deep=True).sum() / 1024 ** 2
+        }
+        for name, df in frames.items()
+    ])
+    return report.set_index('Table').round(2)
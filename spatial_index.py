@@ -0,0 +1,89 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from schema import ponseti_mask
+from geo import to_unit_vectors, distance_to_chord, chord_to_distance
+
+
+class ClinicIndex:
+    """Nearest-neighbour and radius queries over clinic locations on the sphere
+
+    Points are stored as 3D unit vectors in a KD-tree, so the Euclidean
+    chord distance is monotonic in the great-circle distance and every query
+    is O(log n) per point. Results refer to positions in the frame the index
+    was built from (use ``labels`` to map back to the original index).
+    """
+
+    def __init__(self, lons, lats, labels=None):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.labels = np.arange(len(self.lons)) if labels is None else np.asarray(labels)
+        self._tree = cKDTree(to_unit_vectors(self.lons, self.lats)) if len(self.lons) else None
+
+    @classmethod
+    def from_clinics(cls, clinics_df):
+        """Build an index from a clinics frame as returned by load_data()"""
+        return cls(clinics_df['clinic_lon'].to_numpy(), clinics_df['clinic_lat'].to_numpy(), clinics_df.index.to_numpy())
+
+    def __len__(self):
+        return len(self.lons)
+
+    def nearest(self, lons, lats, k=1, unit='km'):
+        """Distances and positions of the k nearest clinics to each query point
+
+        Returns two arrays of shape (n,) for k == 1, otherwise (n, k). Missing
+        neighbours (fewer than k clinics) have an infinite distance and
+        position -1.
+        """
+        points = to_unit_vectors(lons, lats)
+        if self._tree is None:
+            shape = (len(points),) if k == 1 else (len(points), k)
+            return np.full(shape, np.inf), np.full(shape, -1, dtype=np.int64)
+
+        chord, positions = self._tree.query(points, k=k)
+        missing = positions >= len(self)
+        distances = chord_to_distance(chord, unit=unit)
+        distances[missing] = np.inf
+        positions = np.where(missing, -1, positions)
+        return distances, positions
+
+    def within_radius(self, lons, lats, radius, unit='km'):
+        """Positions of all clinics within radius of each query point (one array per point)"""
+        points = to_unit_vectors(lons, lats)
+        if self._tree is None:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(points))]
+        matches = self._tree.query_ball_point(points, distance_to_chord(radius, unit=unit))
+        return [np.asarray(m, dtype=np.int64) for m in matches]
+
+    def count_within_radius(self, lons, lats, radius, unit='km'):
+        """Number of clinics within radius of each query point"""
+        points = to_unit_vectors(lons, lats)
+        if self._tree is None:
+            return np.zeros(len(points), dtype=np.int64)
+        return np.asarray(
+            self._tree.query_ball_point(points, distance_to_chord(radius, unit=unit), return_length=True),
+            dtype=np.int64
+        )
+
+    def pairs_within_radius(self, other, radius, unit='km'):
+        """All (position in self, position in other) pairs closer than radius
+
+        other is another ClinicIndex; both trees are walked together, so no
+        distance matrix is materialised. Returns two int64 arrays.
+        """
+        if self._tree is None or other._tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        pairs = self._tree.sparse_distance_matrix(
+            other._tree, distance_to_chord(radius, unit=unit), output_type='ndarray'
+        )
+        return pairs['i'].astype(np.int64), pairs['j'].astype(np.int64)
+
+
+def build_clinic_indexes(clinics_df):
+    """Build indexes over all, Ponseti and non-Ponseti clinics"""
+    is_ponseti = ponseti_mask(clinics_df)
+    return {
+        'all': ClinicIndex.from_clinics(clinics_df),
+        'ponseti': ClinicIndex.from_clinics(clinics_df[is_ponseti]),
+        'non_ponseti': ClinicIndex.from_clinics(clinics_df[~is_ponseti])
+    }
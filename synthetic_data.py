@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingest import SOURCE_FILES
+from schema import AGE_COLUMNS
+
+# (lat, lon, spread in degrees) of the countries synthetic data is placed in
+COUNTRY_CENTRES = {
+    'Kenya': (0.2, 37.9, 2.5),
+    'Uganda': (1.4, 32.3, 1.5),
+    'Tanzania': (-6.4, 34.9, 3.0),
+    'Ethiopia': (9.1, 40.5, 3.5),
+    'Nigeria': (9.1, 8.7, 3.5),
+    'India': (22.0, 79.0, 6.0),
+    'Bangladesh': (23.7, 90.4, 1.5),
+    'Peru': (-9.2, -75.0, 4.0),
+    'Brazil': (-10.3, -51.9, 8.0),
+    'Philippines': (12.9, 121.8, 3.0)
+}
+
+TREATMENT_YEARS = range(2015, 2024)
+
+
+def _countries(n_countries):
+    if not 1 <= n_countries <= len(COUNTRY_CENTRES):
+        raise ValueError(f"n_countries must be between 1 and {len(COUNTRY_CENTRES)}")
+    return list(COUNTRY_CENTRES)[:n_countries]
+
+
+def _scatter(rng, countries, n):
+    """Random country per point and a position around that country's centre"""
+    centres = np.array([COUNTRY_CENTRES[country] for country in countries])
+    which = rng.integers(0, len(countries), n)
+    lats = rng.normal(centres[which, 0], centres[which, 2])
+    lons = rng.normal(centres[which, 1], centres[which, 2])
+    return which, np.clip(lats, -89, 89), (lons + 180) % 360 - 180
+
+
+def generate_clinics(n_clinics, n_countries=4, seed=0):
+    """Clinic table with the columns of the clinic locations CSV
+
+    About a third of the clinics offer Ponseti treatment and a few have no
+    Ponseti flag or city, like the real data.
+    """
+    rng = np.random.default_rng(seed)
+    countries = _countries(n_countries)
+    which, lats, lons = _scatter(rng, countries, n_clinics)
+    ponseti = pd.array(rng.random(n_clinics) < 0.35, dtype='boolean')
+    ponseti[rng.random(n_clinics) < 0.05] = pd.NA
+    cities = pd.Series([f'City {i}' for i in rng.integers(0, max(n_clinics // 5, 1), n_clinics)])
+    cities[rng.random(n_clinics) < 0.05] = None
+    return pd.DataFrame({
+        'clinic_country': np.array(countries)[which],
+        'clinic_city': cities,
+        'formatted_address': [f'{i} Clinic Road' for i in range(n_clinics)],
+        'clinic_lat': lats.round(6),
+        'clinic_lon': lons.round(6),
+        'ponseti_treatment_available': ponseti,
+        'clinicians_available': rng.integers(0, 12, n_clinics)
+    })
+
+
+def generate_patients(n_patients, clinics_df, seed=0, spread_deg=0.5, precision=3):
+    """Patient table with the columns of the patient location CSV
+
+    Patients live around clinics of their country, so density follows the
+    clinic network. Coordinates are rounded to precision decimals, so
+    neighbours share locations as geocoded addresses do.
+    """
+    rng = np.random.default_rng(seed)
+    home = rng.integers(0, len(clinics_df), n_patients)
+    lats = clinics_df['clinic_lat'].to_numpy(dtype=np.float64)[home] + rng.normal(0, spread_deg, n_patients)
+    lons = clinics_df['clinic_lon'].to_numpy(dtype=np.float64)[home] + rng.normal(0, spread_deg, n_patients)
+    return pd.DataFrame({
+        'patient_id': np.arange(n_patients),
+        'patient_country': clinics_df['clinic_country'].to_numpy()[home],
+        'patient_location_lat': np.clip(lats, -89, 89).round(precision),
+        'patient_location_long': ((lons + 180) % 360 - 180).round(precision)
+    })
+
+
+def generate_treatment(n_countries=4, sites_per_country=10, years=TREATMENT_YEARS, seed=0):
+    """Treatment table with one record per country, year and reporting site"""
+    rng = np.random.default_rng(seed)
+    countries, years_col = zip(*[
+        (country, year)
+        for country in _countries(n_countries) for year in years for _ in range(sites_per_country)
+    ])
+    n = len(countries)
+    treated = rng.integers(0, 200, n)
+    completed_2 = rng.binomial(treated, 0.6)
+    return pd.DataFrame({
+        'Country Name': countries,
+        'YEAR_RECORDED': years_col,
+        'Total new children treated': treated,
+        'number of children completed 2 years FAB': completed_2,
+        'NUMBER_OF_CHILDREN_COMPLETED_4_YEARS_FAB': rng.binomial(completed_2, 0.5),
+        'Expected number of clubfoot cases': treated + rng.integers(0, 300, n),
+        **{col: rng.integers(0, 40, n) for col in AGE_COLUMNS}
+    })
+
+
+def generate_dataset(n_patients, n_clinics, n_countries=4, seed=0):
+    """Clinics, patients and treatment tables of a given size, reproducible from seed"""
+    clinics_df = generate_clinics(n_clinics, n_countries, seed)
+    patients_df = generate_patients(n_patients, clinics_df, seed + 1)
+    treatment_df = generate_treatment(n_countries, max(n_clinics // (10 * n_countries), 1), seed=seed + 2)
+    return clinics_df, patients_df, treatment_df
+
+
+def write_dataset(data_dir, n_patients, n_clinics, n_countries=4, seed=0):
+    """Write a synthetic dataset as CSVs in the layout expected under GCI_DATA_DIR
+
+    Returns the source paths, as ingest.get_source_paths() would for data_dir.
+    """
+    paths = {name: os.path.join(data_dir, relative) for name, relative in SOURCE_FILES.items()}
+    frames = generate_dataset(n_patients, n_clinics, n_countries, seed)
+    for (name, path), df in zip(paths.items(), frames):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+    return paths
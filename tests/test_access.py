@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from access import summarize_access
+
+
+def _access_frame(countries, counts, ponseti_km, non_ponseti_km):
+    return pd.DataFrame({
+        'patient_country': pd.Categorical(countries, categories=['Kenya', 'Rwanda', 'Uganda']),
+        'patient_count': np.array(counts, dtype=np.int32),
+        'ponseti_km': np.array(ponseti_km, dtype=np.float32),
+        'non_ponseti_km': np.array(non_ponseti_km, dtype=np.float32)
+    })
+
+
+def test_summary_weights_patients_by_location():
+    access_df = _access_frame(
+        ['Kenya', 'Kenya', 'Kenya', 'Uganda'], [1, 1, 5, 2], [10, 20, 80, 30], [5, 100, 40, 200]
+    )
+    summary = summarize_access(access_df, 50)
+
+    assert summary['total_patients'] == 9
+    assert summary['within_ponseti_pct'] == 4 / 9 * 100
+    assert summary['within_any_pct'] == 9 / 9 * 100
+    # Five of the nine patients live 80 km away
+    assert summary['median_ponseti_km'] == 80
+    by_country = summary['by_country']
+    assert by_country.index.tolist() == ['Kenya', 'Uganda']
+    assert by_country.loc['Kenya', 'median_ponseti_km'] == 80
+    assert by_country.loc['Uganda', 'median_ponseti_km'] == 30
+    assert by_country.loc['Uganda', 'within_ponseti'] == 100
+
+
+def test_summary_of_a_country_without_patients():
+    summary = summarize_access(_access_frame([], [], [], []), 50)
+
+    assert summary['total_patients'] == 0
+    assert summary['within_ponseti_pct'] == summary['within_any_pct'] == 0.0
+    assert np.isnan(summary['median_ponseti_km'])
+    assert summary['by_country'].empty
+    assert 'median_ponseti_km' in summary['by_country'].columns
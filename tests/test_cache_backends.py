@@ -0,0 +1,48 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_backends import DiskBackend, dumps, get_or_build, loads
+
+
+def test_values_survive_a_round_trip():
+    frame = pd.DataFrame({
+        'country': pd.Categorical(['Kenya', 'Uganda']),
+        'count': pd.array([1, None], dtype='Int16'),
+        'km': np.array([1.5, 2.5], dtype=np.float32)
+    }, index=pd.Index([3, 7], name='year'))
+    value = {
+        'sites': frame,
+        'area_km2': {'ponseti': 1.0, 'any': float('nan')},
+        'levels': {6: frame.iloc[:1]},
+        'figures': (frame['km'].rename('rate'), np.arange(3)),
+        'geojson': {'type': 'FeatureCollection', 'features': [{'coordinates': [[1.0, 2.0]]}]}
+    }
+    copy = loads(dumps(value))
+
+    pd.testing.assert_frame_equal(copy['sites'], frame)
+    assert copy['area_km2']['ponseti'] == 1.0 and np.isnan(copy['area_km2']['any'])
+    pd.testing.assert_frame_equal(copy['levels'][6], frame.iloc[:1])
+    pd.testing.assert_series_equal(copy['figures'][0], frame['km'].rename('rate'))
+    np.testing.assert_array_equal(copy['figures'][1], np.arange(3))
+    assert copy['geojson'] == value['geojson']
+
+
+def test_unknown_types_are_refused():
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+
+class _Exploit:
+    def __reduce__(self):
+        return (pytest.fail, ("a cached pickle was loaded",))
+
+
+def test_pickled_entries_are_rebuilt_not_loaded(tmp_path):
+    backend = DiskBackend(str(tmp_path))
+    backend.set('key', pickle.dumps(_Exploit()))
+
+    assert get_or_build(backend, 'key', lambda: {'rows': 3}) == {'rows': 3}
+    assert loads(backend.get('key')) == {'rows': 3}
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pandas as pd
+
+import ingest
+from data_store import DataStore
+from synthetic_data import generate_patients, write_dataset
+
+
+def _append_patients(path, clinics_path, n, seed):
+    rows = generate_patients(n, pd.read_csv(clinics_path), seed=seed)
+    rows.to_csv(path, mode='a', header=False, index=False)
+
+
+def test_store_picks_up_rows_ingested_by_another_store(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    cache_dir = tmp_path / '.cache'
+    first = DataStore(source_paths, str(cache_dir))
+    second = DataStore(source_paths, str(cache_dir))
+    first.refresh()
+    second.refresh()
+
+    _append_patients(source_paths['patients'], source_paths['clinics'], 100, seed=1)
+    assert first.refresh() == {'patients': 'appended'}
+    # The first store already ingested the rows into the shared cache
+    assert second.refresh() == {'patients': 'appended'}
+
+    assert len(first.patients_df) == len(second.patients_df) == 2100
+    assert first.version() == second.version()
+    assert second.locations_df['patient_count'].sum() == 2100
+
+
+def test_appended_rows_match_a_full_load(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    store = DataStore(source_paths, str(tmp_path / '.cache'))
+    store.refresh()
+    _append_patients(source_paths['patients'], source_paths['clinics'], 100, seed=1)
+    store.refresh()
+
+    fresh = DataStore(source_paths, str(tmp_path / '.fresh'))
+    fresh.refresh()
+    pd.testing.assert_frame_equal(
+        store.locations_df.reset_index(drop=True), fresh.locations_df.reset_index(drop=True)
+    )
+    assert store.version() == fresh.version()
+
+
+def test_snapshot_keeps_frames_and_versions_together(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    store = DataStore(source_paths, str(tmp_path / '.cache'))
+    store.refresh()
+    before = store.snapshot()
+    _append_patients(source_paths['patients'], source_paths['clinics'], 100, seed=1)
+    store.refresh()
+
+    after = store.snapshot()
+    assert len(before.patients_df) == 2000 and len(after.patients_df) == 2100
+    assert before.version('patients') != after.version('patients')
+    assert before.version('clinics') == after.version('clinics')
+
+
+def test_parts_are_merged_after_many_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'MAX_PARTS', 3)
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    cache_dir = str(tmp_path / '.cache')
+    store = DataStore(source_paths, cache_dir)
+    store.refresh()
+    for seed in range(1, 6):
+        _append_patients(source_paths['patients'], source_paths['clinics'], 10, seed=seed)
+        store.refresh()
+
+    assert len(ingest._load_manifest(cache_dir)['patients']['parts']) <= 3
+    assert len([f for f in os.listdir(cache_dir) if f.startswith('patients-') and f.endswith('.parquet')]) <= 3
+    fresh = DataStore(source_paths, str(tmp_path / '.fresh'))
+    fresh.refresh()
+    pd.testing.assert_frame_equal(
+        store.locations_df.reset_index(drop=True), fresh.locations_df.reset_index(drop=True)
+    )
+
+
+def test_stores_starting_together_ingest_each_table_once(tmp_path, monkeypatch):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    cache_dir = str(tmp_path / '.cache')
+    rebuilds = []
+    rebuild_table = ingest._rebuild_table
+
+    def counted_rebuild(name, *args):
+        rebuilds.append(name)
+        return rebuild_table(name, *args)
+
+    monkeypatch.setattr(ingest, '_rebuild_table', counted_rebuild)
+    stores = [DataStore(source_paths, cache_dir) for _ in range(4)]
+    threads = [threading.Thread(target=store.refresh) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(rebuilds) == sorted(ingest.TABLES)
+    assert len({store.version() for store in stores}) == 1
+    listed = {part for entry in ingest._load_manifest(cache_dir).values() for part in entry['parts']}
+    assert {f for f in os.listdir(cache_dir) if f.endswith('.parquet')} == listed
+
+
+def test_unlisted_parts_are_removed(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    cache_dir = tmp_path / '.cache'
+    DataStore(source_paths, str(cache_dir)).refresh()
+    stray = cache_dir / 'patients-0123456789ab.parquet'
+    stray.write_bytes(b'left by a crashed writer')
+
+    DataStore(source_paths, str(cache_dir)).refresh()
+    assert not stray.exists()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from geo import EARTH_RADIUS, haversine, haversine_one_to_many, haversine_pairwise, nearest_neighbour_distances
+from spatial_index import ClinicIndex
+
+# One degree of a great circle with the mean Earth radius
+KM_PER_DEGREE = np.pi * EARTH_RADIUS['km'] / 180
+
+
+def test_haversine_known_distances():
+    assert haversine(0, 0, 1, 0) == pytest.approx(KM_PER_DEGREE)
+    assert haversine(0, 0, 0, 90) == pytest.approx(90 * KM_PER_DEGREE)
+    assert haversine(0, 0, 180, 0) == pytest.approx(np.pi * EARTH_RADIUS['km'])
+    # London to Paris
+    assert haversine(-0.1278, 51.5074, 2.3522, 48.8566) == pytest.approx(343.56, abs=0.01)
+    assert haversine(0, 0, 1, 0, unit='m') == pytest.approx(KM_PER_DEGREE * 1000)
+
+
+def test_haversine_rejects_unknown_units():
+    with pytest.raises(ValueError):
+        haversine(0, 0, 1, 0, unit='miles')
+
+
+def test_vectorized_forms_agree():
+    np.testing.assert_allclose(haversine_one_to_many(0, 0, [1, 2], [0, 0]), [KM_PER_DEGREE, 2 * KM_PER_DEGREE])
+    np.testing.assert_allclose(haversine_pairwise([0, 1], [0, 0]), [[0, KM_PER_DEGREE], [KM_PER_DEGREE, 0]], atol=1e-9)
+
+
+def test_nearest_neighbours_match_the_distance_matrix():
+    rng = np.random.default_rng(0)
+    lons, lats = rng.uniform(28, 42, 300), rng.uniform(-5, 5, 300)
+    matrix = haversine_pairwise(lons, lats)
+    np.fill_diagonal(matrix, np.inf)
+
+    np.testing.assert_allclose(nearest_neighbour_distances(lons, lats, k=3), np.sort(matrix, axis=1)[:, :3], rtol=1e-9)
+
+
+def test_nearest_clinic_distances_and_positions():
+    index = ClinicIndex([0, 1], [0, 0], labels=[10, 20])
+    distances, positions = index.nearest([0.25, 0.9], [0, 0])
+
+    np.testing.assert_allclose(distances, [0.25 * KM_PER_DEGREE, 0.1 * KM_PER_DEGREE])
+    assert positions.tolist() == [0, 1]
+    assert index.labels[positions].tolist() == [10, 20]
+    assert index.count_within_radius([0.5], [0], 0.6 * KM_PER_DEGREE).tolist() == [2]
+
+
+def test_nearest_clinic_without_clinics():
+    distances, positions = ClinicIndex([], []).nearest([0], [0])
+
+    assert np.isinf(distances).all()
+    assert positions.tolist() == [-1]
@@ -0,0 +1,71 @@
+import pandas as pd
+
+import ingest
+from data_store import DataStore
+from schema import concat_frames
+from synthetic_data import write_dataset
+
+
+def _append_line(path, line):
+    with open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def test_chunk_with_every_row_rejected_is_left_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'CHUNK_ROWS', 1000)
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    # Alone in the last chunk, and missing its country
+    _append_line(source_paths['patients'], '2000,,5,5')
+    store = DataStore(source_paths, str(tmp_path / '.cache'))
+    store.refresh()
+
+    assert len(store.patients_df) == 2000
+    assert isinstance(store.patients_df['patient_country'].dtype, pd.CategoricalDtype)
+    assert store.rejected['patients'] == 1
+
+
+def test_append_with_every_row_rejected_keeps_the_table(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    store = DataStore(source_paths, str(tmp_path / '.cache'))
+    store.refresh()
+    before = store.patients_df
+
+    _append_line(source_paths['patients'], '2000,Kenya,abc,5')
+    assert store.refresh() == {}
+    assert store.patients_df is before
+    assert store.rejected['patients'] == 1
+    # A fresh store on the same cache loads the same rows
+    other = DataStore(source_paths, str(tmp_path / '.cache'))
+    other.refresh()
+    assert len(other.patients_df) == 2000
+
+
+def test_rejected_rows_are_listed_with_their_row_number(tmp_path):
+    source_paths = write_dataset(tmp_path, 2000, 50, n_countries=2, seed=0)
+    _append_line(source_paths['patients'], '2000,Kenya,abc,5')
+    _append_line(source_paths['patients'], '2001,,1,36')
+    store = DataStore(source_paths, str(tmp_path / '.cache'))
+    store.refresh()
+    _append_line(source_paths['patients'], '2002,Kenya,1,500')
+    store.refresh()
+
+    report = pd.read_csv(ingest.rejected_report_path('patients', store.cache_dir))
+    assert report['row'].tolist() == [2001, 2002, 2003]
+    assert report['reason'].tolist() == [
+        'invalid patient_location_lat', 'missing patient_country', 'patient_location_long out of range'
+    ]
+    assert (report['source_file'] == source_paths['patients']).all()
+    assert store.rejected['patients'] == 3
+    assert len(store.patients_df) == 2000
+
+
+def test_concat_skips_empty_frames_and_categories_of_null_columns():
+    kenya = pd.DataFrame({'country': pd.Categorical(['Kenya']), 'lat': [1.0]})
+    unknown = pd.DataFrame({'country': pd.Series([None], dtype=float).astype('category'), 'lat': [2.0]})
+    empty = kenya.iloc[:0].assign(country=pd.Categorical([], categories=pd.Index([], dtype=float)))
+    combined = concat_frames([kenya, empty, unknown])
+
+    assert isinstance(combined['country'].dtype, pd.CategoricalDtype)
+    assert combined['country'].tolist()[0] == 'Kenya' and pd.isna(combined['country'].iloc[1])
+    assert combined['lat'].tolist() == [1.0, 2.0]
+    assert concat_frames([empty]).empty
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from validation import validate_chunk
+
+
+def test_rows_are_rejected_with_the_first_failed_check():
+    chunk = pd.DataFrame({
+        'patient_country': ['Kenya', None, 'Kenya', 'Kenya', 'Uganda'],
+        'patient_location_lat': ['1.5', '2.0', 'abc', '95', None],
+        'patient_location_long': ['36.8', 'x', '36.8', '36.8', '32.5']
+    }, index=[10, 11, 12, 13, 14])
+    valid, rejected = validate_chunk('patients', chunk)
+
+    assert valid.index.tolist() == [10]
+    assert valid['patient_location_lat'].tolist() == [1.5]
+    assert rejected.index.tolist() == [11, 12, 13, 14]
+    assert rejected['reason'].tolist() == [
+        'missing patient_country',
+        'invalid patient_location_lat',
+        'patient_location_lat out of range',
+        'missing patient_location_lat'
+    ]
+    # Rejected rows keep their raw values
+    assert rejected.loc[12, 'patient_location_lat'] == 'abc'
+
+
+def test_counts_may_be_empty_but_not_negative_or_text():
+    chunk = pd.DataFrame({
+        'clinic_country': ['Kenya'] * 4,
+        'clinic_city': ['Nairobi'] * 4,
+        'formatted_address': ['1 Road'] * 4,
+        'clinic_lat': [-1.3] * 4,
+        'clinic_lon': [36.8] * 4,
+        'ponseti_treatment_available': [True] * 4,
+        'clinicians_available': ['3', None, '-1', 'many']
+    })
+    valid, rejected = validate_chunk('clinics', chunk)
+
+    assert valid.index.tolist() == [0, 1]
+    assert rejected['reason'].tolist() == ['negative clinicians_available', 'invalid clinicians_available']
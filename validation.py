@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from schema import SCHEMAS
+
+# Valid range of each coordinate column
+COORDINATE_RANGES = {
+    'clinics': {'clinic_lat': (-90, 90), 'clinic_lon': (-180, 180)},
+    'patients': {'patient_location_lat': (-90, 90), 'patient_location_long': (-180, 180)},
+    'treatment': {}
+}
+
+# Columns a row is useless without
+REQUIRED_VALUES = {
+    'clinics': [],
+    'patients': ['patient_country'],
+    'treatment': []
+}
+
+
+def _count_columns(name):
+    """Integer columns of a table; their values must be non-negative numbers where given"""
+    return [col for col, dtype in SCHEMAS[name].items() if dtype.startswith('Int')]
+
+
+def check_columns(name, columns):
+    """Raise ValueError if any column declared in the table's schema is missing"""
+    missing = [col for col in SCHEMAS[name] if col not in columns]
+    if missing:
+        raise ValueError(f"{name} data is missing required columns: {', '.join(missing)}")
+
+
+def validate_chunk(name, df):
+    """Split raw CSV rows of a table into valid and rejected rows
+
+    All checks are vectorized over the chunk. Coordinates must be present,
+    numeric and within range, required values present, and counts numeric
+    and non-negative (they may be empty). Returns (valid, rejected): valid
+    has the checked numeric columns already converted; rejected holds the raw
+    rows, keeping their index, with a 'reason' column naming the first
+    check each row failed.
+    """
+    check_columns(name, df.columns)
+    ok = np.ones(len(df), dtype=bool)
+    reasons = np.full(len(df), None, dtype=object)
+    converted = {}
+
+    def reject(mask, reason):
+        mask = np.asarray(mask, dtype=bool) & ok
+        reasons[mask] = reason
+        ok[mask] = False
+
+    for col in REQUIRED_VALUES[name]:
+        reject(df[col].isna(), f'missing {col}')
+
+    for col, (low, high) in COORDINATE_RANGES[name].items():
+        values = pd.to_numeric(df[col], errors='coerce')
+        reject(df[col].isna(), f'missing {col}')
+        reject(values.isna(), f'invalid {col}')
+        reject(~values.between(low, high), f'{col} out of range')
+        converted[col] = values
+
+    for col in _count_columns(name):
+        values = pd.to_numeric(df[col], errors='coerce')
+        reject(values.isna() & df[col].notna(), f'invalid {col}')
+        reject(values < 0, f'negative {col}')
+        converted[col] = values
+
+    valid = df[ok].copy()
+    for col, values in converted.items():
+        valid[col] = values[ok]
+    rejected = df[~ok].copy()
+    rejected.insert(0, 'reason', reasons[~ok])
+    return valid, rejected